@@ -0,0 +1,250 @@
+"""
+Per-stage benchmark of the remove_background pipeline.
+
+Times each stage separately over a matrix of synthetic image sizes and
+formats (median of --runs, in milliseconds):
+
+    decode          Image.open(...).convert("RGBA") – full resolution
+    decode_reduced  reduced-resolution decode used for inference
+    preprocess      downscale + normalise into the input tensor
+    inference       session.run (mask output only)
+    postprocess     mask -> full-size alpha
+    composite       alpha attached to the RGBA image
+    encode_<FORMAT> result encode, once per --encode format
+                    (default: png, i.e. Pillow's defaults)
+
+By default the model is a generated stand-in with U2Net's signature
+(one 3x3 convolution, seven sigmoid outputs), so the suite runs offline
+in seconds and times everything *around* the network; pass --model to
+time a real one.  Generating the stand-in needs the ``onnx`` package.
+
+    python bench_stages.py [--sizes 640x480 1920x1080 4000x3000]
+                           [--formats jpeg png webp] [--runs 5]
+                           [--encode png png:1 webp webp:80]
+                           [--model u2net] [--json out.json]
+                           [--baseline old.json] [--tolerance 0.2]
+
+With --baseline, exits non-zero if any stage is slower than the baseline
+by more than the tolerance.
+"""
+
+import argparse
+import io
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+import bg_remover
+from model_registry import ModelSpec, register_model
+
+TINY_MODEL = "bench-tiny"
+STAGES = ("decode", "decode_reduced", "preprocess", "inference",
+          "postprocess", "composite")
+
+
+def make_tiny_model(path: str, size: int = 320):
+    """Write an ONNX model with U2Net's input/output signature:
+    ``input.1`` (N, 3, size, size) float -> ``d0``..``d6`` (N, 1, size,
+    size), each behind a sigmoid."""
+    from onnx import TensorProto, helper, numpy_helper, save
+
+    rng = np.random.default_rng(0)
+    weight = (rng.standard_normal((1, 3, 3, 3)) * 0.1).astype(np.float32)
+    nodes = [helper.make_node("Conv", ["input.1", "w"], ["feat"],
+                              pads=[1, 1, 1, 1])]
+    outputs = []
+    for i in range(7):
+        nodes.append(helper.make_node("Sigmoid", ["feat"], [f"d{i}"]))
+        outputs.append(helper.make_tensor_value_info(
+            f"d{i}", TensorProto.FLOAT, ["batch", 1, size, size]))
+    graph = helper.make_graph(
+        nodes, "u2net_standin",
+        [helper.make_tensor_value_info(
+            "input.1", TensorProto.FLOAT, ["batch", 3, size, size])],
+        outputs, [numpy_helper.from_array(weight, "w")],
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    save(model, path)
+    return path
+
+
+def synthetic_image(width: int, height: int) -> Image.Image:
+    """Photo-like test image: smooth gradients, a subject, mild noise."""
+    rng = np.random.default_rng(width * 7 + height)
+    base = Image.fromarray(
+        rng.integers(0, 255, (9, 12, 3), dtype=np.uint8)
+    ).resize((width, height), Image.BICUBIC)
+    arr = np.asarray(base, dtype=np.int16)
+    yy, xx = np.ogrid[:height, :width]
+    subject = ((yy - height / 2) / (height / 3)) ** 2 + \
+        ((xx - width / 2) / (width / 5)) ** 2 < 1
+    arr = np.where(subject[..., None], 255 - arr, arr)
+    arr += rng.integers(-4, 5, arr.shape, dtype=np.int16)
+    return Image.fromarray(np.clip(arr, 0, 255).astype(np.uint8))
+
+
+def encode(image: Image.Image, fmt: str) -> bytes:
+    buf = io.BytesIO()
+    image.save(buf, format=fmt.upper(), quality=90)
+    return buf.getvalue()
+
+
+def _time(fn, runs: int):
+    """``(median ms, last result)`` of *runs* calls of *fn*."""
+    samples, result = [], None
+    for _ in range(runs):
+        start = time.perf_counter()
+        result = fn()
+        samples.append((time.perf_counter() - start) * 1000.0)
+    return statistics.median(samples), result
+
+
+def _encode_stage(fmt: str) -> str:
+    return "encode_" + fmt.replace(":", "_")
+
+
+def bench_case(data: bytes, spec, runs: int, encodes=("png",)) -> dict:
+    """Median milliseconds of every stage for one encoded image, plus the
+    output size of each encode format in bytes (``<stage>_bytes``)."""
+    session = bg_remover.get_session(spec)
+    input_name = session.get_inputs()[0].name
+    output_name = bg_remover._mask_output_name(session, spec)
+    tensor = bg_remover._get_input_buffer(session, spec)
+    size = spec.input_size
+    ms = {}
+
+    ms["decode"], image = _time(
+        lambda: Image.open(io.BytesIO(data)).convert("RGBA"), runs)
+
+    def decode_reduced():
+        reduced, _full = bg_remover._open_reduced(io.BytesIO(data), size)
+        reduced.load()
+        return reduced
+    ms["decode_reduced"], reduced = _time(decode_reduced, runs)
+
+    def preprocess():
+        small = bg_remover._downscale(reduced, size)
+        bg_remover._fill_input(tensor[0], small, spec)
+    ms["preprocess"], _ = _time(preprocess, runs)
+
+    session.run([output_name], {input_name: tensor})    # warm-up
+    ms["inference"], outputs = _time(
+        lambda: session.run([output_name], {input_name: tensor}), runs)
+    mask = outputs[0][0]
+
+    ms["postprocess"], alpha = _time(
+        lambda: bg_remover._postprocess(mask, image.size), runs)
+    ms["composite"], result = _time(
+        lambda: bg_remover._composite(image, alpha), runs)
+    ms["total"] = sum(ms[s] for s in STAGES if s != "decode_reduced")
+    for i, fmt in enumerate(encodes):
+        output = bg_remover.OutputFormat.parse(fmt)
+        stage = _encode_stage(fmt)
+        ms[stage], out = _time(lambda: output.encode(result), runs)
+        ms[stage + "_bytes"] = len(out)
+        if i == 0:
+            ms["total"] += ms[stage]
+    return ms
+
+
+def run_suite(sizes: list, formats: list, runs: int, spec,
+              encodes=("png",)) -> dict:
+    """Time every case; the total counts the first *encodes* format."""
+    results = {}
+    columns = STAGES + tuple(_encode_stage(e) for e in encodes) + ("total",)
+    header = "".join(f"{s:>15}" for s in columns)
+    print(f"{'case':<20}{header}")
+    for w, h in sizes:
+        image = synthetic_image(w, h)
+        for fmt in formats:
+            case = f"{w}x{h}.{fmt}"
+            ms = bench_case(encode(image, fmt), spec, runs, encodes)
+            results[case] = ms
+            print(f"{case:<20}" + "".join(f"{ms[s]:>15.1f}" for s in columns))
+            print(f"{'':<20}" + "".join(
+                f"{ms[_encode_stage(e) + '_bytes'] / 1024:>12.0f} KB"
+                for e in encodes).rjust(15 * (len(columns) - 1)))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """``case/stage`` names slower than *baseline* by more than
+    *tolerance*."""
+    slower = []
+    for case, stages in results.items():
+        for stage, value in stages.items():
+            if stage.endswith("_bytes"):
+                continue
+            old = baseline.get(case, {}).get(stage)
+            if old and value > old * (1 + tolerance):
+                slower.append(f"{case}/{stage}")
+                print(f"  REGRESSION {case} {stage}: "
+                      f"{old:.1f} -> {value:.1f} ms")
+    return slower
+
+
+def _parse_size(text: str) -> tuple:
+    w, _, h = text.lower().partition("x")
+    return int(w), int(h)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Per-stage benchmark")
+    parser.add_argument("--sizes", nargs="+", type=_parse_size,
+                        default=[(640, 480), (1920, 1080), (4000, 3000)])
+    parser.add_argument("--formats", nargs="+", default=["jpeg", "png"],
+                        choices=["jpeg", "png", "webp"])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--encode", nargs="+", default=["png"],
+                        help="output formats to time (bg_remover "
+                             "OutputFormat short forms, e.g. png:1 webp:80)")
+    parser.add_argument("--model", default=None,
+                        help="registered model to time instead of the "
+                             "generated stand-in")
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown vs baseline (default 0.2)")
+    args = parser.parse_args(argv)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        if args.model:
+            spec = bg_remover._spec(args.model)
+        else:
+            try:
+                path = make_tiny_model(os.path.join(tmp, "u2net_tiny.onnx"))
+            except ImportError:
+                print("[ERROR] The stand-in model needs the 'onnx' package: "
+                      "pip install onnx (or pass --model)")
+                return 1
+            spec = register_model(ModelSpec(TINY_MODEL, filename=path,
+                                            url=""))
+        bg_remover._graph_cache_enabled = False
+        print(f"Stage benchmark: model {spec.name}, {args.runs} runs each")
+        results = run_suite(args.sizes, args.formats, args.runs, spec,
+                            args.encode)
+
+    report = {"model": spec.name, "runs": args.runs, "results": results}
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"Results written to {args.json}")
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        if compare(results, baseline.get("results", {}), args.tolerance):
+            return 1
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,153 @@
+"""
+Startup benchmark: import times and time to first frame.
+
+Every measurement runs in a fresh interpreter so module caches do not hide
+regressions.  Reported metrics (median of --runs, in milliseconds):
+
+    import_bg_remover   ``import bg_remover`` (also records whether Kivy
+                        got pulled in, which it must not)
+    import_ui_screens   ``import ui.screens``
+    session_ready       bg_remover.preload() – load + warm-up (needs model)
+    first_frame         interpreter start to the app's first drawn frame
+                        (needs a display)
+
+    python bench_startup.py [--runs 5] [--json out.json]
+                            [--baseline old.json] [--tolerance 0.2]
+
+With --baseline, exits non-zero if any metric is slower than the baseline
+by more than the tolerance.
+"""
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+_ROOT = os.path.dirname(os.path.abspath(__file__))
+
+_PROBES = {
+    "import_bg_remover": """
+import sys, time
+t = time.perf_counter()
+import bg_remover
+print(json.dumps({"ms": (time.perf_counter() - t) * 1000,
+                  "kivy_imported": "kivy" in sys.modules}))
+""",
+    "import_ui_screens": """
+import time
+t = time.perf_counter()
+import ui.screens
+print(json.dumps({"ms": (time.perf_counter() - t) * 1000}))
+""",
+    "session_ready": """
+import time
+import bg_remover
+if not bg_remover.check_model_exists():
+    print(json.dumps({"skipped": "model not found"}))
+else:
+    t = time.perf_counter()
+    bg_remover.preload()
+    print(json.dumps({"ms": (time.perf_counter() - t) * 1000}))
+""",
+    "first_frame": """
+import time
+from kivy.clock import Clock
+from ui.app import RemoveBGApp
+
+class _BenchApp(RemoveBGApp):
+    def on_start(self):
+        super().on_start()
+        Clock.schedule_once(self._first_frame, 0)
+
+    def _first_frame(self, dt):
+        print(json.dumps({"ms": (time.perf_counter() - T0) * 1000}))
+        self.stop()
+
+_BenchApp().run()
+""",
+}
+
+
+def _run_probe(name: str) -> dict:
+    code = "import json, time\nT0 = time.perf_counter()\n" + _PROBES[name]
+    env = dict(os.environ, KIVY_NO_ARGS="1", KIVY_NO_CONSOLELOG="1",
+               BG_REMOVER_GRAPH_CACHE=os.environ.get(
+                   "BG_REMOVER_GRAPH_CACHE", "1"))
+    proc = subprocess.run(
+        [sys.executable, "-c", code], cwd=_ROOT, env=env,
+        capture_output=True, text=True, timeout=300,
+    )
+    for line in reversed(proc.stdout.splitlines()):
+        if line.startswith("{"):
+            return json.loads(line)
+    err = (proc.stderr.strip().splitlines()
+           or [f"exit status {proc.returncode}"])[-1]
+    return {"skipped": err}
+
+
+def measure(runs: int) -> dict:
+    results = {}
+    for name in _PROBES:
+        samples, extra = [], {}
+        for _ in range(runs):
+            out = _run_probe(name)
+            if "skipped" in out:
+                extra = out
+                break
+            samples.append(out.pop("ms"))
+            extra = out
+        if samples:
+            results[name] = dict(extra, ms=statistics.median(samples),
+                                 runs=len(samples))
+        else:
+            results[name] = extra
+        print(f"  {name:<18} " + (
+            f"{results[name]['ms']:8.1f} ms" if samples
+            else f"skipped ({extra.get('skipped')})"))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Names of metrics slower than *baseline* by more than *tolerance*."""
+    slower = []
+    for name, res in results.items():
+        old = baseline.get(name, {})
+        if "ms" in res and "ms" in old and res["ms"] > old["ms"] * (1 + tolerance):
+            slower.append(name)
+            print(f"  REGRESSION {name}: {old['ms']:.1f} -> {res['ms']:.1f} ms")
+    return slower
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Startup benchmark")
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--json", help="write results to this file")
+    parser.add_argument("--baseline", help="results file to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.2,
+                        help="allowed slowdown vs baseline (default 0.2)")
+    args = parser.parse_args(argv)
+
+    print(f"Startup benchmark ({args.runs} runs each):")
+    results = measure(args.runs)
+
+    failed = False
+    if results.get("import_bg_remover", {}).get("kivy_imported"):
+        print("  REGRESSION import_bg_remover: Kivy imported")
+        failed = True
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if args.baseline:
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        failed = bool(compare(results, baseline, args.tolerance)) or failed
+
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
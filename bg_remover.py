@@ -7,13 +7,48 @@ Android : uses the Java ONNX Runtime Android AAR via pyjnius
           of the Python package needed).
 """
 
+import contextlib
+import hashlib
 import io
+import json
 import os
+import struct
+import sys
+import threading
+import time
+import weakref
+import zlib
+from concurrent.futures import CancelledError
 
 import numpy as np
 from PIL import Image
 
-from kivy.utils import platform
+import instrumentation
+from instrumentation import stage as _stage
+from mask_cache import DEFAULT_MAX_BYTES, MaskCache
+from session_config import SessionConfig, default_config, load_profile
+from model_registry import (
+    DEFAULT_MODEL, MODELS, ModelSpec, get_model_spec, register_model,
+)
+
+
+def _detect_platform() -> str:
+    """Same answer as ``kivy.utils.platform`` without importing Kivy."""
+    kivy_build = os.environ.get("KIVY_BUILD", "")
+    if kivy_build in ("android", "ios"):
+        return kivy_build
+    if "P4A_BOOTSTRAP" in os.environ or "ANDROID_ARGUMENT" in os.environ:
+        return "android"
+    if sys.platform in ("win32", "cygwin"):
+        return "win"
+    if sys.platform == "darwin":
+        return "macosx"
+    if sys.platform.startswith(("linux", "freebsd")):
+        return "linux"
+    return "unknown"
+
+
+platform = _detect_platform()
 
 # ---------------------------------------------------------------------------
 # Model directory – always relative to *this* file so the bundled model
@@ -21,57 +56,274 @@ from kivy.utils import platform
 # ---------------------------------------------------------------------------
 _THIS_DIR = os.path.dirname(os.path.abspath(__file__))
 MODEL_DIR = os.path.join(_THIS_DIR, "models")
-os.makedirs(MODEL_DIR, exist_ok=True)
 
-MODEL_NAME = "u2net"
-MODEL_FILE = os.path.join(MODEL_DIR, f"{MODEL_NAME}.onnx")
+# Default model (see model_registry for the others)
+MODEL_NAME = DEFAULT_MODEL
+MODEL_FILE = get_model_spec(MODEL_NAME).path
+
+# Written by prune_model.py: same weights, only the d1 output is kept.
+# Preferred over MODEL_FILE when present.
+PRUNED_MODEL_FILE = get_model_spec(MODEL_NAME).pruned_path
+
+# Written by fold_preprocess.py: takes raw uint8 (N, H, W, 3) pixels with
+# normalisation folded into the graph.  Preferred over both of the above.
+FOLDED_MODEL_FILE = get_model_spec(MODEL_NAME).folded_path
 
-# Global ONNX session (lazy loaded)
-_session = None
+# Session pools by model name (sessions inside are lazy loaded)
+_pools = {}
+_pools_lock = threading.Lock()
+
+# Optional on-disk mask cache (see enable_mask_cache)
+_mask_cache = None
+
+# Options for new sessions; None = saved profile or platform defaults
+# (see get_session_config)
+_session_config = None
+
+# Serialise optimised graphs next to the model and reuse them on later
+# starts (set BG_REMOVER_GRAPH_CACHE=0 to disable)
+_graph_cache_enabled = os.environ.get("BG_REMOVER_GRAPH_CACHE", "1") != "0"
+
+# Per-model readiness, set once a session is loaded and warmed up
+_ready_events = {}
 
 # ---------------------------------------------------------------------------
 # Public helpers
 # ---------------------------------------------------------------------------
 
-def check_model_exists() -> bool:
-    return os.path.isfile(MODEL_FILE)
+def _spec(model=None) -> ModelSpec:
+    """Resolve a model name (or spec, or None for the default)."""
+    if isinstance(model, ModelSpec):
+        return model
+    return get_model_spec(model or MODEL_NAME)
+
+
+def resolve_model(model=None) -> ModelSpec:
+    """The ``ModelSpec`` for a model name, a spec, or None (the default)."""
+    return _spec(model)
+
+
+def check_model_exists(model=None) -> bool:
+    return os.path.isfile(get_model_path(model))
+
+
+def get_model_path(model=None) -> str:
+    """Path of the file the session loads for *model* (rewritten ones first)."""
+    spec = _spec(model)
+    for path in spec.candidate_paths():
+        if os.path.isfile(path):
+            return path
+    return spec.path
+
+
+def enable_mask_cache(directory: str = None,
+                      max_bytes: int = DEFAULT_MAX_BYTES) -> MaskCache:
+    """Route inference through a content-addressed on-disk mask cache.
+
+    The cache may be shared by several processes.  Set the
+    ``BG_REMOVER_CACHE_DIR`` environment variable to enable it at import.
+    """
+    global _mask_cache
+    _mask_cache = MaskCache(
+        directory or os.path.join(MODEL_DIR, "mask_cache"), max_bytes
+    )
+    return _mask_cache
+
 
+def disable_mask_cache():
+    global _mask_cache
+    _mask_cache = None
 
-def get_model_path() -> str:
-    return MODEL_FILE
+
+def _model_id(model=None) -> str:
+    """Cheap model identity for cache keys: file name, size and mtime."""
+    path = get_model_path(model)
+    st = os.stat(path)
+    return f"{os.path.basename(path)}:{st.st_size}:{st.st_mtime_ns}"
+
+
+if os.environ.get("BG_REMOVER_CACHE_DIR"):
+    enable_mask_cache(os.environ["BG_REMOVER_CACHE_DIR"])
+
+
+def get_session_config() -> SessionConfig:
+    """Options used for new sessions.
+
+    The profile saved by tune_session.py when there is one for this
+    machine, otherwise the platform defaults.
+    """
+    global _session_config
+    if _session_config is None:
+        _session_config = load_profile() or default_config(platform)
+    return _session_config
+
+
+def set_session_config(config: SessionConfig = None):
+    """Use *config* for sessions created from now on (None: reload the
+    saved profile / defaults).  Already open sessions are unaffected."""
+    global _session_config
+    _session_config = config
 
 
 # ---------------------------------------------------------------------------
 # Pre / post-processing  (shared between Android and desktop)
 # ---------------------------------------------------------------------------
 
-_INPUT_SIZE = (320, 320)  # U2Net expected input
+# Sources larger than this multiple of the input size are first shrunk with
+# a cheap integer box reduce before the final LANCZOS filter.
+_REDUCING_GAP = 3
+_REDUCIBLE_MODES = ("RGB", "RGBA", "L", "LA", "CMYK")
+
+# Per-model normalisation folded into one multiply-add per channel:
+#   (x / 255 - mean) / std  ==  x * scale + offset
+_norm_constants = {}
+
+
+def _get_norm_constants(spec: ModelSpec) -> tuple:
+    consts = _norm_constants.get(spec.name)
+    if consts is None:
+        mean = np.array(spec.mean, dtype=np.float32)
+        std = np.array(spec.std, dtype=np.float32)
+        consts = _norm_constants[spec.name] = (
+            (1.0 / (255.0 * std)).astype(np.float32)[:, None, None],
+            (-mean / std).astype(np.float32)[:, None, None],
+        )
+    return consts
+
+
+def _normalise(img_array: np.ndarray, out: np.ndarray = None,
+               spec: ModelSpec = None) -> np.ndarray:
+    """Normalise an (H, W, 3) uint8 array into a (3, H, W) float32 array.
+
+    Cast, scale, shift and HWC->CHW transpose happen in a single pass
+    written into *out* (allocated if not given).
+    """
+    scale, offset = _get_norm_constants(spec or _spec())
+    chw = img_array.transpose(2, 0, 1)
+    if out is None:
+        out = np.empty(chw.shape, dtype=np.float32)
+    np.multiply(chw, scale, out=out, casting="unsafe")
+    out += offset
+    return out
+
+
+def _downscale(image: Image.Image, size: tuple) -> Image.Image:
+    """Resize to *size* as RGB, box-reducing large sources first."""
+    factor = min(image.size[0] // (size[0] * _REDUCING_GAP),
+                 image.size[1] // (size[1] * _REDUCING_GAP))
+    if factor > 1 and image.mode in _REDUCIBLE_MODES:
+        image = image.reduce(factor)
+    if image.mode != "RGB":
+        image = image.convert("RGB")
+    return image.resize(size, Image.LANCZOS)
+
+
+def _preprocess(image: Image.Image, out: np.ndarray = None,
+                spec: ModelSpec = None) -> np.ndarray:
+    """Return the (1, 3, H, W) model input for *image*.
+
+    If *out* is given, the (3, H, W) float32 slot is filled in place and
+    returned as-is, so callers can write straight into a batch tensor.
+    """
+    spec = spec or _spec()
+    arr = np.asarray(_downscale(image, spec.input_size))   # (H, W, 3) uint8
+    if out is not None:
+        return _normalise(arr, out, spec)
+    return _normalise(arr, spec=spec)[None]                 # (1, 3, H, W)
+
 
+class _InputBuffers:
+    """Preallocated input tensors for one session.
 
-def _normalise(img_array: np.ndarray) -> np.ndarray:
-    mean = np.array([0.485, 0.456, 0.406], dtype=np.float32)
-    std = np.array([0.229, 0.224, 0.225], dtype=np.float32)
-    return (img_array.astype(np.float32) / 255.0 - mean) / std
+    NCHW float32 for regular models, NHWC uint8 for models with the
+    normalisation folded in (``raw``).  Kept per thread so concurrent
+    callers never share a buffer while it is being filled or consumed by
+    ``session.run``.
+    """
 
+    def __init__(self, size: tuple, raw: bool = False):
+        self.size = size
+        self.raw = raw
+        self._local = threading.local()
 
-def _preprocess(image: Image.Image) -> np.ndarray:
-    img = image.convert("RGB").resize(_INPUT_SIZE, Image.LANCZOS)
-    arr = _normalise(np.array(img))            # (H, W, 3) float32
-    arr = arr.transpose(2, 0, 1)               # (3, H, W)
-    return np.expand_dims(arr, axis=0).astype(np.float32)  # (1, 3, H, W)
+    def get(self, batch: int) -> np.ndarray:
+        bufs = getattr(self._local, "bufs", None)
+        if bufs is None:
+            bufs = self._local.bufs = {}
+        buf = bufs.get(batch)
+        if buf is None:
+            w, h = self.size
+            if self.raw:
+                buf = np.empty((batch, h, w, 3), dtype=np.uint8)
+            else:
+                buf = np.empty((batch, 3, h, w), dtype=np.float32)
+            bufs[batch] = buf
+        return buf
 
 
-def _postprocess(mask: np.ndarray, original_size: tuple) -> np.ndarray:
-    mask = np.squeeze(mask)
-    ma, mi = mask.max(), mask.min()
+_input_buffers = weakref.WeakKeyDictionary()
+
+
+def _get_input_buffer(session, spec: ModelSpec, batch: int = 1) -> np.ndarray:
+    buffers = _input_buffers.get(session)
+    if buffers is None:
+        buffers = _input_buffers.setdefault(
+            session, _InputBuffers(spec.input_size, _is_raw_input(session))
+        )
+    return buffers.get(batch)
+
+
+def _is_raw_input(session) -> bool:
+    """True for models taking uint8 NHWC pixels (see fold_preprocess.py)."""
+    return getattr(session.get_inputs()[0], "type", None) == "tensor(uint8)"
+
+
+def _fill_input(out: np.ndarray, small: Image.Image, spec: ModelSpec):
+    """Load a downscaled RGB image into one slot of an input buffer."""
+    arr = np.asarray(small)
+    if out.dtype == np.uint8:
+        np.copyto(out, arr)       # model normalises in-graph
+    else:
+        _normalise(arr, out, spec)
+
+
+def _mask_output_name(session, spec: ModelSpec) -> str:
+    """Name of the output holding the mask (pruned models have only one)."""
+    outputs = session.get_outputs()
+    if len(outputs) == 1:
+        return outputs[0].name
+    return outputs[spec.output_index].name
+
+
+# Filter for the model-size -> full-size mask upsample (BILINEAR or BICUBIC)
+MASK_RESAMPLE = Image.BILINEAR
+
+
+def _postprocess(mask: np.ndarray, original_size: tuple,
+                 resample: int = None) -> Image.Image:
+    """Turn a raw model mask into a full-size ``L`` alpha image.
+
+    The mask is min-max scaled to 0..255 in float at model resolution,
+    upsampled as a float (``F``) image and quantised once, with clipping,
+    at the target size.
+    """
+    mask_img = _mask_image(mask)
+    if mask_img.size != tuple(original_size):
+        mask_img = mask_img.resize(
+            original_size, MASK_RESAMPLE if resample is None else resample
+        )
+    return mask_img.convert("L")
+
+
+def _mask_image(mask: np.ndarray) -> Image.Image:
+    """Raw model mask as a model-resolution ``F`` image scaled to 0..255."""
+    mask = np.squeeze(mask).astype(np.float32, copy=False)
+    ma, mi = float(mask.max()), float(mask.min())
     if ma - mi > 1e-6:
-        mask = (mask - mi) / (ma - mi)
+        mask = (mask - mi) * (255.0 / (ma - mi))
     else:
         mask = np.zeros_like(mask)
-    mask = (mask * 255).astype(np.uint8)
-    mask_img = Image.fromarray(mask, mode="L")
-    mask_img = mask_img.resize(original_size, Image.LANCZOS)
-    return np.array(mask_img)
+    return Image.fromarray(mask, mode="F")
 
 
 # =========================================================================
@@ -81,7 +333,13 @@ def _postprocess(mask: np.ndarray, original_size: tuple) -> np.ndarray:
 
 class _AndroidOnnxSession:
     """Thin wrapper that mimics the Python onnxruntime.InferenceSession API
-    while calling the Java ONNX Runtime Android library via pyjnius."""
+    while calling the Java ONNX Runtime Android library via pyjnius.
+
+    Every input and output shape gets one direct, native-order ByteBuffer
+    with an ``OnnxTensor`` over it, created on first use and reused by
+    later runs.  Outputs are pinned to their buffers so ORT writes into
+    them in place, and only the requested outputs are computed.
+    """
 
     def __init__(self, model_path: str):
         from jnius import autoclass
@@ -91,138 +349,1663 @@ class _AndroidOnnxSession:
         self._ByteBuffer = autoclass("java.nio.ByteBuffer")
         self._ByteOrder  = autoclass("java.nio.ByteOrder")
         self._HashMap     = autoclass("java.util.HashMap")
+        self._HashSet     = autoclass("java.util.HashSet")
+        self._OnnxJavaType = autoclass("ai.onnxruntime.OnnxJavaType")
 
         OrtEnvironment    = autoclass("ai.onnxruntime.OrtEnvironment")
         OrtSessionOptions = autoclass("ai.onnxruntime.OrtSession$SessionOptions")
 
+        OptLevel = autoclass("ai.onnxruntime.OrtSession$SessionOptions$OptLevel")
+
         self._env = OrtEnvironment.getEnvironment()
-        opts = OrtSessionOptions()
-        opts.setIntraOpNumThreads(2)
-        opts.setInterOpNumThreads(1)
 
-        print(f"[BG Remover] Opening ONNX session: {model_path}")
-        self._session = self._env.createSession(model_path, opts)
+        config = get_session_config()
+
+        def make_opts():
+            return config.apply_android(OrtSessionOptions())
+
+        cache = None
+        if _graph_cache_enabled:
+            try:
+                version = str(self._env.getVersion())
+            except Exception:
+                version = "android"
+            cache = _graph_cache_path(model_path, version)
+
+        self._session = None
+        if cache and os.path.isfile(cache):
+            print(f"[BG Remover] Opening cached optimised graph: {cache}")
+            opts = make_opts()
+            opts.setOptimizationLevel(OptLevel.NO_OPT)
+            try:
+                self._session = self._env.createSession(cache, opts)
+            except Exception as e:
+                print(f"[BG Remover] Graph cache unusable ({e}), rebuilding")
+                _remove_quietly(cache)
+
+        if self._session is None:
+            print(f"[BG Remover] Opening ONNX session: {model_path}")
+            opts = make_opts()
+            opts.setOptimizationLevel(OptLevel.ALL_OPT)
+            tmp = _graph_cache_tmp(cache) if cache else None
+            if tmp:
+                opts.setOptimizedModelFilePath(tmp)
+            self._session = self._env.createSession(model_path, opts)
+            if tmp:
+                _commit_graph_cache(tmp, cache, model_path)
 
         # Cache input / output names (preserves model order)
         self._input_name   = list(self._session.getInputNames())[0]
         self._output_names = list(self._session.getOutputNames())
         print(f"[BG Remover] inputs={self._input_name}  outputs={self._output_names}")
 
-    # -- mimic onnxruntime.InferenceSession.get_inputs() --
+        # Shapes; Java reports dynamic dims as -1, onnxruntime as None
+        in_info = self._session.getInputInfo().get(self._input_name)
+        self._input_shape = self._node_shape(in_info)
+        self._input_type = (
+            "tensor(uint8)" if in_info.getInfo().type.name() == "UINT8"
+            else "tensor(float)"
+        )
+        out_info = self._session.getOutputInfo()
+        self._output_shapes = {
+            name: self._node_shape(out_info.get(name))
+            for name in self._output_names
+        }
+
+        self._slots = {}  # (kind, name, shape) -> _TensorSlot
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _node_shape(node_info) -> list:
+        return [int(d) if int(d) >= 0 else None
+                for d in node_info.getInfo().getShape()]
+
+    # -- mimic onnxruntime.InferenceSession.get_inputs() / get_outputs() --
     class _InputMeta:
-        def __init__(self, name: str):
+        def __init__(self, name: str, shape: list,
+                     elem_type: str = "tensor(float)"):
             self.name = name
+            self.shape = shape
+            self.type = elem_type
 
     def get_inputs(self):
-        return [self._InputMeta(self._input_name)]
+        return [self._InputMeta(self._input_name, self._input_shape,
+                                self._input_type)]
 
-    # -- mimic onnxruntime.InferenceSession.run() --
-    def run(self, _output_names, input_dict: dict):
-        jmap = self._HashMap()
-
-        for name, value in input_dict.items():
-            arr = np.ascontiguousarray(value, dtype=np.float32)
-            buf_bytes = arr.ravel().tobytes()
-            jbb = self._ByteBuffer.wrap(buf_bytes)
-            jbb.order(self._ByteOrder.nativeOrder())
-            fbuf = jbb.asFloatBuffer()
-            tensor = self._OnnxTensor.createTensor(
-                self._env, fbuf, list(arr.shape)
+    def get_outputs(self):
+        return [self._InputMeta(name, self._output_shapes[name])
+                for name in self._output_names]
+
+    # -- reusable direct buffers --
+    class _TensorSlot:
+        """Direct native-order ByteBuffer plus an OnnxTensor viewing it.
+
+        Input slots also own a Python-side staging ``bytearray`` (viewed
+        as a numpy array) that is handed to ``ByteBuffer.put`` each run.
+        """
+
+        def __init__(self, owner, shape: tuple, dtype, staging: bool):
+            dtype = np.dtype(dtype)
+            nbytes = dtype.itemsize * int(np.prod(shape))
+            self.shape = shape
+            self.buffer = owner._ByteBuffer.allocateDirect(nbytes)
+            self.buffer.order(owner._ByteOrder.nativeOrder())
+            if dtype == np.uint8:
+                self.tensor = owner._OnnxTensor.createTensor(
+                    owner._env, self.buffer, list(shape),
+                    owner._OnnxJavaType.UINT8,
+                )
+            else:
+                self.tensor = owner._OnnxTensor.createTensor(
+                    owner._env, self.buffer.asFloatBuffer(), list(shape)
+                )
+            self.staging = bytearray(nbytes) if staging else None
+            self.array = (np.frombuffer(self.staging, dtype=dtype)
+                          .reshape(shape) if staging else None)
+
+        def upload(self):
+            self.buffer.clear()
+            try:
+                # Input-only argument: skip pyjnius' copy back into Python
+                self.buffer.put(self.staging, pass_by_reference=False)
+            except TypeError:  # pyjnius without pass_by_reference
+                self.buffer.put(bytes(self.staging))
+
+        def close(self):
+            self.tensor.close()
+
+    def _slot(self, kind: str, name: str, shape: tuple, dtype=np.float32):
+        key = (kind, name, shape, np.dtype(dtype).char)
+        slot = self._slots.get(key)
+        if slot is None:
+            slot = self._slots[key] = self._TensorSlot(
+                self, shape, dtype, staging=(kind == "in")
             )
-            jmap.put(name, tensor)
+        return slot
 
-        results = self._session.run(jmap)
+    def _resolve_output_shape(self, name: str, batch: int):
+        """Output shape with the batch dim filled in, or None if unknown."""
+        shape = list(self._output_shapes[name])
+        if shape and shape[0] is None:
+            shape[0] = batch
+        return tuple(shape) if None not in shape else None
+
+    # -- mimic onnxruntime.InferenceSession.run() --
+    def run(self, output_names, input_dict: dict):
+        names = list(output_names) if output_names else self._output_names
 
-        output_list = []
-        for out_name in self._output_names:
-            tensor_obj = results.get(out_name).get()
+        with self._lock:
+            jinputs = self._HashMap()
+            batch = 1
+            for name, value in input_dict.items():
+                value = np.asarray(value)
+                if value.dtype != np.uint8:
+                    value = value.astype(np.float32, copy=False)
+                slot = self._slot("in", name, value.shape, value.dtype)
+                np.copyto(slot.array, value)
+                slot.upload()
+                jinputs.put(name, slot.tensor)
+                batch = value.shape[0]
 
-            # Read shape from tensor metadata
-            shape = [int(s) for s in tensor_obj.getInfo().getShape()]
+            # Pin outputs when every requested shape is known up front.
+            # ORT rejects a name that is both requested and pinned, so the
+            # requested set is then left empty.
+            jrequested = self._HashSet()
+            shapes = [self._resolve_output_shape(n, batch) for n in names]
+            pinned = None not in shapes
+            if pinned:
+                jpinned = self._HashMap()
+                for name, shape in zip(names, shapes):
+                    jpinned.put(name, self._slot("out", name, shape).tensor)
+                results = self._session.run(jinputs, jrequested, jpinned)
+            else:
+                for name in names:
+                    jrequested.add(name)
+                results = self._session.run(jinputs, jrequested)
 
-            raw = bytes(tensor_obj.getByteBuffer().array())
-            np_arr = np.frombuffer(raw, dtype=np.float32).copy()
-            np_arr = np_arr.reshape(shape)
+            output_list = []
+            for name in names:
+                tensor_obj = results.get(name).get()
+                shape = [int(s) for s in tensor_obj.getInfo().getShape()]
 
-            output_list.append(np_arr)
-            tensor_obj.close()
+                # One native copy out of ORT, then a zero-copy numpy view
+                raw = tensor_obj.getByteBuffer().array()
+                output_list.append(
+                    np.frombuffer(raw, dtype=np.float32).reshape(shape)
+                )
+                if not pinned:
+                    tensor_obj.close()
 
-        results.close()
+            results.close()
         return output_list
 
+    def close(self):
+        for slot in self._slots.values():
+            slot.close()
+        self._slots.clear()
+        self._session.close()
+
 
 # =========================================================================
 # Desktop – normal Python onnxruntime
 # =========================================================================
 
-def _create_desktop_session(model_path: str):
+def _create_desktop_session(model_path: str, config: SessionConfig = None):
     import onnxruntime as ort
-    opts = ort.SessionOptions()
-    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
-    return ort.InferenceSession(
-        model_path, sess_options=opts, providers=["CPUExecutionProvider"]
+
+    config = config or get_session_config()
+
+    def make_opts(level):
+        opts = config.apply_desktop(ort.SessionOptions())
+        opts.graph_optimization_level = level
+        return opts
+
+    providers = ["CPUExecutionProvider"]
+    cache = None
+    if _graph_cache_enabled:
+        cache = _graph_cache_path(model_path, ort.__version__)
+        if os.path.isfile(cache):
+            try:
+                return ort.InferenceSession(
+                    cache,
+                    sess_options=make_opts(
+                        ort.GraphOptimizationLevel.ORT_DISABLE_ALL),
+                    providers=providers,
+                )
+            except Exception as e:
+                print(f"[BG Remover] Graph cache unusable ({e}), rebuilding")
+                _remove_quietly(cache)
+
+    opts = make_opts(ort.GraphOptimizationLevel.ORT_ENABLE_ALL)
+    tmp = _graph_cache_tmp(cache) if cache else None
+    if tmp:
+        opts.optimized_model_filepath = tmp
+    session = ort.InferenceSession(
+        model_path, sess_options=opts, providers=providers
     )
+    if tmp:
+        _commit_graph_cache(tmp, cache, model_path)
+    return session
+
+
+# =========================================================================
+# Optimised-graph cache
+# =========================================================================
+
+_GRAPH_CACHE_SUFFIX = ".opt"   # not ".onnx": keeps it out of the APK
+
+
+def _file_fingerprint(path: str) -> str:
+    """Cheap content identity: size, mtime and the first/last 64 KiB."""
+    h = hashlib.sha256()
+    st = os.stat(path)
+    h.update(f"{st.st_size}:{st.st_mtime_ns}".encode())
+    with open(path, "rb") as f:
+        h.update(f.read(65536))
+        if st.st_size > 65536:
+            f.seek(-65536, os.SEEK_END)
+            h.update(f.read(65536))
+    return h.hexdigest()
+
+
+def _cpu_name() -> str:
+    import platform as host
+    try:
+        with open("/proc/cpuinfo", "r", encoding="utf-8",
+                  errors="replace") as f:
+            for line in f:
+                if line.lower().startswith(("model name", "hardware")):
+                    return line.split(":", 1)[1].strip()
+    except OSError:
+        pass
+    return host.processor()
+
+
+def _graph_cache_path(model_path: str, runtime_version: str) -> str:
+    """Cache file for *model_path* under this runtime on this CPU.
+
+    ORT_ENABLE_ALL graphs may contain CPU-specific layouts, so the key
+    covers the model, the runtime version and the host CPU.
+    """
+    import platform as host
+    key = hashlib.sha256("|".join((
+        _file_fingerprint(model_path), runtime_version,
+        host.machine(), _cpu_name(),
+    )).encode()).hexdigest()[:16]
+    return f"{model_path}.{key}{_GRAPH_CACHE_SUFFIX}"
+
+
+def _graph_cache_tmp(cache: str) -> str:
+    """Private write target for *cache*: sessions can be loaded by several
+    processes, and by several threads of one pool, at the same time."""
+    return f"{cache}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+
+def _commit_graph_cache(tmp: str, cache: str, model_path: str):
+    """Move a freshly written graph into place and drop stale ones."""
+    if not os.path.isfile(tmp):
+        return
+    try:
+        os.replace(tmp, cache)
+    except OSError:
+        _remove_quietly(tmp)
+        return
+    print(f"[BG Remover] Saved optimised graph: {cache}")
+    directory, base = os.path.split(model_path)
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        if (name.startswith(base + ".") and name.endswith(_GRAPH_CACHE_SUFFIX)
+                and path != cache):
+            _remove_quietly(path)
+
+
+def _remove_quietly(path: str):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
 
 
 # =========================================================================
 # Unified session loader
 # =========================================================================
 
-def get_session():
-    """Get or create the ONNX inference session (platform-aware)."""
-    global _session
-    if _session is not None:
-        return _session
+class SessionPool:
+    """Sessions for one model, shared by concurrent callers.
+
+    Holds up to *size* sessions, each lent to at most *runs_per_session*
+    callers at a time; ``checkout`` blocks once every slot is taken.
+    Sessions are created on demand, one at a time per pool, so callers
+    racing for a cold model wait for the load instead of starting their
+    own.
+    """
+
+    def __init__(self, factory, size: int = 1, runs_per_session: int = 1):
+        self.size = max(1, int(size))
+        self.runs_per_session = max(1, int(runs_per_session))
+        self._factory = factory
+        self._sessions = []
+        self._free = []        # one entry per free slot
+        self._loading = 0
+        self._cond = threading.Condition()
+
+    @property
+    def sessions(self) -> list:
+        return list(self._sessions)
 
-    if not check_model_exists():
+    def checkout(self, timeout: float = None):
+        """Borrow a session; give it back with ``checkin``."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        with self._cond:
+            while not self._free:
+                if len(self._sessions) + self._loading < self.size:
+                    self._loading += 1
+                    break
+                remaining = None if deadline is None \
+                    else deadline - time.monotonic()
+                if remaining is not None and remaining <= 0:
+                    raise TimeoutError("no free session")
+                self._cond.wait(remaining)
+            else:
+                return self._free.pop()
+        # Load outside the lock so free sessions stay available meanwhile
+        return self._load(keep=True)
+
+    def checkin(self, session):
+        with self._cond:
+            self._free.append(session)
+            self._cond.notify()
+
+    @contextlib.contextmanager
+    def session(self, timeout: float = None):
+        """``with pool.session() as s:`` – checkout/checkin around a block."""
+        session = self.checkout(timeout)
+        try:
+            yield session
+        finally:
+            self.checkin(session)
+
+    def primary(self):
+        """The first session (loaded if needed), without checking it out."""
+        with self._cond:
+            while not self._sessions:
+                if not self._loading:
+                    self._loading += 1
+                    break
+                self._cond.wait()
+            else:
+                return self._sessions[0]
+        return self._load(keep=False)
+
+    def fill(self) -> list:
+        """Create every session now; returns them all."""
+        while True:
+            with self._cond:
+                if len(self._sessions) + self._loading >= self.size:
+                    break
+                self._loading += 1
+            self._load(keep=False)
+        with self._cond:
+            while self._loading:
+                self._cond.wait()
+            return list(self._sessions)
+
+    def _load(self, keep: bool):
+        """Run the factory for a slot reserved via ``_loading`` and publish
+        the new session's slots (all but one if the caller *keep*s it)."""
+        try:
+            session = self._factory()
+        except BaseException:
+            with self._cond:
+                self._loading -= 1
+                self._cond.notify_all()
+            raise
+        with self._cond:
+            self._loading -= 1
+            self._sessions.append(session)
+            self._free.extend(
+                [session] * (self.runs_per_session - (1 if keep else 0)))
+            self._cond.notify_all()
+        return session
+
+
+# Sessions per model and concurrent runs per session for new pools.
+# Android sessions serialise ``run`` internally, so extra slots only queue.
+POOL_SIZE = 1
+RUNS_PER_SESSION = 1 if platform == "android" else 2
+
+
+def configure_pool(model=None, size: int = None,
+                   runs_per_session: int = None) -> SessionPool:
+    """Set how many sessions *model* gets and how many concurrent runs each
+    takes.  Replaces the model's pool; its loaded sessions are dropped
+    once no caller holds them any more."""
+    spec = _spec(model)
+    pool = SessionPool(lambda: _open_session(spec),
+                       POOL_SIZE if size is None else size,
+                       RUNS_PER_SESSION if runs_per_session is None
+                       else runs_per_session)
+    with _pools_lock:
+        _pools[spec.name] = pool
+    return pool
+
+
+def get_pool(model=None) -> SessionPool:
+    """The session pool of *model*, created with the defaults if needed."""
+    spec = _spec(model)
+    pool = _pools.get(spec.name)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(spec.name)
+            if pool is None:
+                pool = _pools[spec.name] = SessionPool(
+                    lambda: _open_session(spec), POOL_SIZE, RUNS_PER_SESSION)
+    return pool
+
+
+def get_session(model=None):
+    """Get or create the ONNX inference session for *model* (platform-aware).
+
+    Each registered model gets its own session, so several can be used
+    side by side in one process.  Concurrent callers share the load.
+    Inference inside this module borrows sessions from ``get_pool``
+    instead, which bounds concurrent runs.
+    """
+    return get_pool(model).primary()
+
+
+def _open_session(spec: ModelSpec):
+    if not check_model_exists(spec):
+        if not spec.url:
+            raise FileNotFoundError(
+                f"Model not found at {spec.path}.\n"
+                f"It is generated locally – see models/README.txt."
+            )
         raise FileNotFoundError(
-            f"Model not found at {MODEL_FILE}.\n"
-            f"Download from: https://github.com/danielgatis/rembg/releases/"
-            f"download/v0.0.0/{MODEL_NAME}.onnx\n"
+            f"Model not found at {spec.path}.\n"
+            f"Download from: {spec.url}\n"
             f"and place it in: {MODEL_DIR}"
         )
 
+    model_path = get_model_path(spec)
     if platform == "android":
-        _session = _AndroidOnnxSession(MODEL_FILE)
+        return _AndroidOnnxSession(model_path)
+    return _create_desktop_session(model_path)
+
+
+def warm_up(model=None):
+    """Run one dummy input through every session of *model* so kernels,
+    arenas and input buffers are set up before the first real image."""
+    spec = _spec(model)
+    for session in get_pool(spec).fill():
+        tensor = _get_input_buffer(session, spec)
+        tensor[...] = 0
+        session.run([_mask_output_name(session, spec)],
+                    {session.get_inputs()[0].name: tensor})
+
+
+def preload(model=None, warm: bool = True):
+    """Load (and warm up) the sessions for *model*, then mark it ready."""
+    spec = _spec(model)
+    start = time.perf_counter()
+    session = get_session(spec)
+    if warm:
+        warm_up(spec)
     else:
-        _session = _create_desktop_session(MODEL_FILE)
+        get_pool(spec).fill()
+    print(f"[BG Remover] {spec.name} ready in "
+          f"{time.perf_counter() - start:.2f}s")
+    _ready_event(spec).set()
+    return session
 
-    return _session
+
+def is_ready(model=None) -> bool:
+    return _ready_event(_spec(model)).is_set()
+
+
+def wait_until_ready(model=None, timeout: float = None) -> bool:
+    """Block until ``preload`` has finished for *model*; False on timeout."""
+    return _ready_event(_spec(model)).wait(timeout)
+
+
+def _ready_event(spec: ModelSpec) -> threading.Event:
+    event = _ready_events.get(spec.name)
+    if event is None:
+        event = _ready_events.setdefault(spec.name, threading.Event())
+    return event
 
 
 # ---------------------------------------------------------------------------
 # Public API
 # ---------------------------------------------------------------------------
 
-def remove_background(image_path: str, output_path: str = None) -> Image.Image:
-    image = Image.open(image_path).convert("RGBA")
-    result = remove_background_pil(image)
+@instrumentation.operation("remove_background")
+def remove_background(image_path: str, output_path: str = None,
+                      model=None, output_format=None) -> Image.Image:
+    """Cutout of an image file, written to *output_path* if given.
+
+    *output_format* (``OutputFormat`` or its short form, default: the one
+    set with ``set_output_format``) controls the encoding; for ``mask``
+    the returned image is the grayscale alpha.
+    """
+    fmt = _output(output_format)
+    mask, size, image = _source_mask(
+        image_path, _file_cache_key(image_path, model), model,
+        keep=fmt.kind != "mask")
+    result = _result(image_path, mask, size, fmt, image)
     if output_path:
-        result.save(output_path)
+        fmt.save(result, output_path)
     return result
 
 
-def remove_background_from_bytes(image_bytes: bytes) -> bytes:
-    image = Image.open(io.BytesIO(image_bytes)).convert("RGBA")
-    result = remove_background_pil(image)
-    buf = io.BytesIO()
-    result.save(buf, format="PNG")
-    return buf.getvalue()
+@instrumentation.operation("remove_background_from_bytes")
+def remove_background_from_bytes(image_bytes: bytes, model=None,
+                                 output_format=None) -> bytes:
+    """``remove_background`` for encoded image bytes; returns the encoded
+    result (PNG unless *output_format* says otherwise)."""
+    fmt = _output(output_format)
+    mask, size, image = _source_mask(
+        io.BytesIO(image_bytes), _bytes_cache_key(image_bytes, model), model,
+        keep=fmt.kind != "mask")
+    return fmt.encode(_result(io.BytesIO(image_bytes), mask, size, fmt,
+                              image))
+
+
+@instrumentation.operation("get_mask")
+def get_mask(image_path: str, output_path: str = None,
+             model=None) -> Image.Image:
+    """Full-resolution alpha mask ("L") of an image file.
+
+    A JPEG is only decoded at reduced resolution; other formats have no
+    reduced decode and are decoded once, at full size.
+    """
+    mask, size, _image = _source_mask(
+        image_path, _file_cache_key(image_path, model), model)
+    with _stage("postprocess"):
+        alpha = _postprocess(mask, size)
+    if output_path:
+        with _stage("encode"):
+            alpha.save(output_path)
+    return alpha
+
+
+@instrumentation.operation("get_mask_from_bytes")
+def get_mask_from_bytes(image_bytes: bytes, model=None) -> bytes:
+    """``get_mask`` for encoded image bytes; returns a grayscale PNG."""
+    mask, size, _image = _source_mask(
+        io.BytesIO(image_bytes), _bytes_cache_key(image_bytes, model), model)
+    with _stage("postprocess"):
+        alpha = _postprocess(mask, size)
+    return OutputFormat("mask").encode(alpha)
+
+
+@instrumentation.operation("remove_background_progressive")
+def remove_background_progressive(image_path: str, preview_size: tuple,
+                                  on_preview, output_path: str = None,
+                                  model=None, output_format=None,
+                                  cancel: threading.Event = None
+                                  ) -> Image.Image:
+    """``remove_background`` in two steps, for interactive use.
+
+    As soon as the mask exists, ``on_preview(preview)`` is called with an
+    RGBA cutout fitted within *preview_size*, composited from the same
+    reduced-resolution decode the model saw.  The full-resolution cutout
+    is then made, written to *output_path* if given, and returned.
+
+    *cancel* is checked between steps; once it is set ``CancelledError``
+    is raised (a step already running completes first).
+    """
+    spec = _spec(model)
+    fmt = _output(output_format)
+    cache_key = _file_cache_key(image_path, spec)
+    _check_cancel(cancel)
+
+    with Image.open(image_path) as source:
+        full_size = source.size
+        if source.format == "JPEG":
+            source.draft("RGB", (
+                max(preview_size[0], spec.input_size[0] * _REDUCING_GAP),
+                max(preview_size[1], spec.input_size[1] * _REDUCING_GAP),
+            ))
+        with _stage("decode"):
+            source.load()
+            image = source if source.mode in ("RGB", "RGBA") \
+                else source.convert("RGBA")
+        mask = _predict_mask(image, cache_key, spec)
+        _check_cancel(cancel)
+        with _stage("preview"):
+            preview = image.resize(fit_size(full_size, preview_size),
+                                   Image.BILINEAR, reducing_gap=2.0)
+            preview = _composite(preview, _postprocess(mask, preview.size),
+                                 inplace=True)
+        on_preview(preview)
+
+        _check_cancel(cancel)
+        if image.size == full_size and fmt.kind != "mask":
+            # Not a reduced decode: finish on it instead of decoding again
+            result = _finish(image, mask)
+        else:
+            result = _result(image_path, mask, full_size, fmt)
+    if output_path:
+        _check_cancel(cancel)
+        fmt.save(result, output_path)
+    return result
+
+
+def fit_size(size: tuple, bounds: tuple) -> tuple:
+    """*size* scaled down, aspect kept, to fit within *bounds* (never
+    enlarged); how ``remove_background_progressive`` sizes its preview."""
+    w, h = size
+    scale = min(bounds[0] / w, bounds[1] / h, 1.0)
+    return max(1, round(w * scale)), max(1, round(h * scale))
+
+
+def _check_cancel(cancel: threading.Event = None):
+    if cancel is not None and cancel.is_set():
+        raise CancelledError()
+
+
+def _file_cache_key(image_path: str, model=None):
+    if _mask_cache is None:
+        return None
+    with _stage("cache"), open(image_path, "rb") as f:
+        return _mask_cache.key(f.read(), _model_id(model))
+
+
+def _bytes_cache_key(image_bytes: bytes, model=None):
+    if _mask_cache is None:
+        return None
+    with _stage("cache"):
+        return _mask_cache.key(image_bytes, _model_id(model))
+
+
+def _decode_full(source) -> Image.Image:
+    """Full-resolution RGBA decode of an image file or file object."""
+    with _stage("decode"):
+        return Image.open(source).convert("RGBA")
+
+
+def _open_reduced(source, size: tuple) -> tuple:
+    """Lazily open *source* for the inference branch.
+
+    JPEGs are set to decode at the smallest DCT scale (1/2 .. 1/8) that
+    still covers ``_REDUCING_GAP`` times *size*, so a 12-48 MP photo costs
+    a fraction of a full decode.  Nothing is decoded until the pixels are
+    used.  Returns ``(image, full-resolution size)``.
+    """
+    image = Image.open(source)
+    full_size = image.size
+    if image.format == "JPEG":
+        image.draft("RGB", (size[0] * _REDUCING_GAP,
+                            size[1] * _REDUCING_GAP))
+    return image, full_size
+
+
+def _source_mask(source, cache_key: str = None, model=None,
+                 keep: bool = False) -> tuple:
+    """``(model-resolution mask, full image size, image)`` for an encoded
+    image, decoded at reduced resolution (not at all on a mask cache hit).
+
+    Only JPEGs have a reduced decode; other formats are decoded at full
+    size for the model.  With *keep* that decode is returned as *image*
+    for ``_result`` to composite onto, instead of decoding again;
+    otherwise, and after a reduced decode, *image* is None.
+    """
+    spec = _spec(model)
+    image, full_size = _open_reduced(source, spec.input_size)
+    with image:
+        if keep and image.size == full_size:
+            image = _load_full(image)
+            return _predict_mask(image, cache_key, spec), full_size, image
+        return _predict_mask(image, cache_key, spec), full_size, None
+
+
+def _load_full(image: Image.Image) -> Image.Image:
+    """Full-resolution decode of an opened image as RGB or RGBA, fit for
+    the model input and for compositing alike."""
+    with _stage("decode"):
+        image.load()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA")
+        return image
+
+
+def prepare_model_input(source, model=None, keep: bool = False) -> tuple:
+    """``(model input image, full size, image)`` for an encoded image, for
+    callers that run the model themselves (see ``predict_masks``).
+
+    A JPEG is decoded at reduced resolution.  Other formats are decoded
+    at full size; with *keep* that decode is returned as *image* for
+    ``render_result``, else *image* is None.
+    """
+    spec = _spec(model)
+    image, full_size = _open_reduced(source, spec.input_size)
+    with image:
+        if keep and image.size == full_size:
+            image = _load_full(image)
+            return _downscale(image, spec.input_size), full_size, image
+        return _downscale(image, spec.input_size), full_size, None
 
 
-def remove_background_pil(image: Image.Image) -> Image.Image:
-    session = get_session()
-    rgb = image.convert("RGB")
-    original_size = rgb.size  # (W, H)
+def render_result(source, mask: np.ndarray, size: tuple,
+                  output_format=None, image: Image.Image = None
+                  ) -> Image.Image:
+    """What *output_format* writes for the encoded image *source*, given
+    its model-resolution *mask* and full *size*: the grayscale alpha for
+    ``mask``, else the cutout, composited onto *image* (from
+    ``prepare_model_input``; it is modified) when given."""
+    return _result(source, mask, size, _output(output_format), image)
+
+
+def _result(source, mask: np.ndarray, size: tuple, fmt: "OutputFormat",
+            image: Image.Image = None) -> Image.Image:
+    """What *fmt* writes: the alpha alone for ``mask``, else the cutout,
+    composited onto *image* if given (it is modified) or onto a fresh
+    full-resolution decode of *source*."""
+    if fmt.kind == "mask":
+        with _stage("postprocess"):
+            return _postprocess(mask, size)
+    return _finish(image if image is not None else _decode_full(source),
+                   mask)
+
+
+@instrumentation.operation("remove_background_pil")
+def remove_background_pil(image: Image.Image, model=None) -> Image.Image:
+    """Cutout of an already decoded image; *image* is left untouched."""
+    mask = _predict_mask(image, model=model)
+    with _stage("postprocess"):
+        alpha = _postprocess(mask, image.size)
+    with _stage("composite"):
+        return _composite(image, alpha)
+
+
+def predict_mask(image: Image.Image, model=None) -> np.ndarray:
+    """Raw model-resolution mask for a decoded image, for callers that
+    post-process masks themselves (see ``mask_to_alpha``)."""
+    return _predict_mask(image, model=model)
+
+
+def mask_to_alpha(mask: np.ndarray, size: tuple) -> Image.Image:
+    """A raw model mask as an ``L`` alpha image of *size*."""
+    return _postprocess(mask, size)
+
+
+def apply_alpha(image: Image.Image, alpha: Image.Image) -> Image.Image:
+    """RGBA copy of *image* with *alpha* as its alpha channel."""
+    return _composite(image, alpha)
+
+
+def _predict_mask(image: Image.Image, cache_key: str = None,
+                  model=None) -> np.ndarray:
+    """Return the model-resolution mask for *image*.
+
+    With the mask cache enabled, *cache_key* (a hash of the encoded input)
+    is looked up first; without one, the key is the hash of the
+    downscaled model-input pixels.
+    """
+    spec = _spec(model)
+    cache = _mask_cache
+    small = None
+    if cache is not None:
+        if cache_key is None:
+            with _stage("preprocess"):
+                small = _downscale(image, spec.input_size)
+            cache_key = cache.key(small.tobytes(), _model_id(spec))
+        with _stage("cache"):
+            mask = cache.get(cache_key)
+        if mask is not None:
+            return mask
+
+    with _stage("preprocess"):
+        if small is None:
+            small = _downscale(image, spec.input_size)
+    with get_pool(spec).session() as session:
+        with _stage("preprocess"):
+            tensor = _get_input_buffer(session, spec)
+            _fill_input(tensor[0], small, spec)
+        input_name = session.get_inputs()[0].name
+        output_name = _mask_output_name(session, spec)
+        with _stage("inference"):
+            outputs = session.run([output_name], {input_name: tensor})
+
+    mask = outputs[0][0]
+    if cache is not None:
+        with _stage("cache"):
+            mask = cache.put(cache_key, mask)
+    return mask
+
+
+@instrumentation.operation("remove_background_batch")
+def remove_background_batch(images, batch_size: int = 8, model=None) -> list:
+    """Remove the background from several PIL images.
+
+    Preprocessed images are stacked into ``(N, 3, H, W)`` tensors so each
+    ``session.run`` call covers up to *batch_size* images.  The last partial
+    batch is zero-padded to keep the input shape stable.  Models exported
+    with a fixed batch dimension are run one image at a time instead.
+    Images found in the mask cache are not sent to the model.
+    """
+    images = list(images)
+    if not images:
+        return []
+
+    spec = _spec(model)
+    with get_pool(spec).session() as session:
+        return _remove_background_batch(images, batch_size, spec, session)
+
+
+def _remove_background_batch(images: list, batch_size: int, spec: ModelSpec,
+                             session) -> list:
+    if not _supports_batching(session):
+        batch_size = 1
+    batch_size = max(1, int(batch_size))
+
+    results = []
+    for start in range(0, len(images), batch_size):
+        chunk = images[start:start + batch_size]
+        with _stage("preprocess"):
+            smalls = [_downscale(img, spec.input_size) for img in chunk]
+        masks = _predict_masks(smalls, spec, session, batch_size)
+        for img, mask in zip(chunk, masks):
+            with _stage("postprocess"):
+                alpha = _postprocess(mask, img.size)
+            with _stage("composite"):
+                results.append(_composite(img, alpha))
+    return results
+
+
+def _predict_masks(smalls: list, spec: ModelSpec, session,
+                   batch_size: int = None) -> list:
+    """Model-resolution masks for images already downscaled to the model
+    input size, in one ``session.run``.
+
+    The input is zero-padded to *batch_size* rows (default: no padding)
+    so repeated calls keep a stable shape.  Images found in the mask cache
+    are not sent to the model.
+    """
+    cache = _mask_cache
+    model_id = _model_id(spec) if cache is not None else None
+    masks = [None] * len(smalls)
+    pending = []  # (index, downscaled image, cache key)
+    for i, small in enumerate(smalls):
+        key = None
+        if cache is not None:
+            key = cache.key(small.tobytes(), model_id)
+            masks[i] = cache.get(key)
+            if masks[i] is not None:
+                continue
+        pending.append((i, small, key))
+    if not pending:
+        return masks
+
+    rows = max(len(pending), batch_size or 0)
+    with _stage("preprocess"):
+        tensor = _get_input_buffer(session, spec, rows)
+        for j, (_i, small, _key) in enumerate(pending):
+            _fill_input(tensor[j], small, spec)
+        tensor[len(pending):] = 0
 
-    tensor = _preprocess(rgb)
     input_name = session.get_inputs()[0].name
-    outputs = session.run(None, {input_name: tensor})
+    output_name = _mask_output_name(session, spec)
+    with _stage("inference"):
+        outputs = session.run([output_name], {input_name: tensor})
+
+    for j, (i, _small, key) in enumerate(pending):
+        masks[i] = outputs[0][j]
+        if cache is not None:
+            masks[i] = cache.put(key, masks[i])
+    return masks
+
+
+def predict_masks(images: list, model=None, batch_size: int = None) -> list:
+    """Model-resolution masks for images already at the model input size
+    (see ``prepare_model_input``), in one ``session.run`` on a session
+    from the model's pool.
+
+    The input is zero-padded to *batch_size* rows (default: no padding),
+    so callers can keep every run at one shape.  Images found in the mask
+    cache are not sent to the model.
+    """
+    spec = _spec(model)
+    with get_pool(spec).session() as session:
+        return _predict_masks(list(images), spec, session, batch_size)
+
+
+def supports_batching(model=None) -> bool:
+    """True if *model* runs more than one image per ``session.run``; the
+    session is loaded if it is not yet."""
+    return _supports_batching(get_pool(_spec(model)).primary())
+
+
+def _supports_batching(session) -> bool:
+    """True if the model input accepts a batch dimension other than 1."""
+    shape = getattr(session.get_inputs()[0], "shape", None)
+    if not shape:
+        return False
+    # Symbolic ("batch_size") or unknown (None) dims are dynamic
+    return not isinstance(shape[0], int)
+
+
+def _composite(image: Image.Image, alpha: Image.Image,
+               inplace: bool = False) -> Image.Image:
+    """Attach *alpha* to *image* as its alpha channel.
+
+    With ``inplace=True`` an RGBA *image* owned by the caller is reused as
+    the output buffer instead of being copied.
+    """
+    if image.mode != "RGBA":
+        image = image.convert("RGBA")
+    elif not inplace:
+        image = image.copy()
+    image.putalpha(alpha)
+    return image
+
+
+# =========================================================================
+# Output encoding
+# =========================================================================
+
+OUTPUT_KINDS = ("png", "webp", "mask")
+
+
+class OutputFormat:
+    """How results are encoded.
+
+    ``png``   RGBA PNG.  *compress_level* 0-9 trades size for time: 6 is
+              Pillow's default, 1 encodes several times faster for a
+              somewhat larger file.
+    ``webp``  RGBA WebP.  Lossless by default (*quality* is then the
+              compression effort); with ``lossless=False`` the colour is
+              lossy at *quality* and the alpha plane stays exact.
+              *method* 0-6 is the speed/size trade-off.
+    ``mask``  The alpha alone as a grayscale PNG, at *compress_level*.
+              A JPEG source is never decoded at full resolution for it.
+
+    ``OutputFormat.parse`` reads the short form used on command lines:
+    ``png``, ``png:1``, ``webp`` (lossless), ``webp:80`` (lossy at quality
+    80), ``mask``, ``mask:1``.
+    """
+
+    def __init__(self, kind: str = "png", compress_level: int = 6,
+                 lossless: bool = True, quality: int = 80, method: int = 4):
+        if kind not in OUTPUT_KINDS:
+            raise ValueError(f"output kind must be one of {OUTPUT_KINDS}")
+        self.kind = kind
+        self.compress_level = _in_range("compress_level", compress_level, 9)
+        self.lossless = bool(lossless)
+        self.quality = _in_range("quality", quality, 100)
+        self.method = _in_range("method", method, 6)
+
+    @classmethod
+    def parse(cls, text: str) -> "OutputFormat":
+        kind, _, arg = text.strip().lower().partition(":")
+        if kind not in OUTPUT_KINDS:
+            raise ValueError(f"unknown output format {text!r}; expected "
+                             f"one of {', '.join(OUTPUT_KINDS)}")
+        if not arg:
+            return cls(kind)
+        try:
+            value = int(arg)
+        except ValueError:
+            raise ValueError(f"bad output format option in {text!r}") \
+                from None
+        if kind == "webp":
+            return cls(kind, lossless=False, quality=value)
+        return cls(kind, compress_level=value)
+
+    @property
+    def extension(self) -> str:
+        return ".webp" if self.kind == "webp" else ".png"
+
+    @property
+    def mime_type(self) -> str:
+        return "image/webp" if self.kind == "webp" else "image/png"
+
+    def save_options(self) -> dict:
+        """Pillow ``save`` arguments, format included."""
+        if self.kind == "webp":
+            return {"format": "WEBP", "lossless": self.lossless,
+                    "quality": self.quality, "method": self.method,
+                    "alpha_quality": 100}
+        return {"format": "PNG", "compress_level": self.compress_level}
+
+    def prepare(self, image: Image.Image) -> Image.Image:
+        """The image actually written: the alpha plane for ``mask``."""
+        if self.kind == "mask" and image.mode != "L":
+            return image.getchannel("A")
+        return image
+
+    def encode(self, image: Image.Image) -> bytes:
+        with _stage("encode"):
+            buf = io.BytesIO()
+            self.prepare(image).save(buf, **self.save_options())
+            return buf.getvalue()
+
+    def save(self, image: Image.Image, path: str):
+        with _stage("encode"):
+            self.prepare(image).save(path, **self.save_options())
+
+    def __eq__(self, other):
+        return isinstance(other, OutputFormat) and \
+            vars(self) == vars(other)
+
+    def __repr__(self):
+        if self.kind == "webp":
+            mode = "lossless" if self.lossless else f"quality={self.quality}"
+            return f"OutputFormat(webp, {mode}, method={self.method})"
+        return f"OutputFormat({self.kind}, level={self.compress_level})"
+
+
+def _in_range(name: str, value, top: int) -> int:
+    """*value* as an int, checked to lie in 0..*top*, so a bad setting
+    fails here rather than when the first image is encoded."""
+    value = int(value)
+    if not 0 <= value <= top:
+        raise ValueError(f"{name} must be 0-{top}, got {value}")
+    return value
+
+
+_output_format = OutputFormat()
+
+
+def get_output_format() -> OutputFormat:
+    return _output_format
+
+
+def set_output_format(output_format=None):
+    """Default encoding for results: an ``OutputFormat``, its short form
+    (``"webp:80"``) or None for PNG at Pillow's default level."""
+    global _output_format
+    if isinstance(output_format, str):
+        output_format = OutputFormat.parse(output_format)
+    _output_format = output_format or OutputFormat()
+
+
+def _output(output_format=None) -> OutputFormat:
+    if output_format is None:
+        return _output_format
+    if isinstance(output_format, str):
+        return OutputFormat.parse(output_format)
+    return output_format
+
+
+class Encoder:
+    """Encodes and writes results on a background thread, so the caller
+    can go on to the next image's inference meanwhile (Pillow's zlib and
+    WebP encoders release the GIL, as does ONNX Runtime).
+
+    ``submit`` blocks while *max_pending* results are still waiting to be
+    written, which bounds the images held in memory.  Use as a context
+    manager; leaving it waits for every write.
+    """
+
+    def __init__(self, workers: int = 1, max_pending: int = 2):
+        from concurrent.futures import ThreadPoolExecutor
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="bg_remover_encode")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+
+    def submit(self, image: Image.Image, path: str, output_format=None):
+        """Queue *image* to be written to *path*; returns a Future."""
+        fmt = _output(output_format)
+        self._slots.acquire()
+        fn, args = fmt.save, (image, path)
+        context = instrumentation.current_context()
+        if context is not None:
+            fn, args = context.run, (fn,) + args
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _f: self._slots.release())
+        return future
+
+    def close(self, wait: bool = True):
+        self._executor.shutdown(wait=wait)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# =========================================================================
+# Memory-bounded path for very large images
+# =========================================================================
+
+# Images above this many pixels go through remove_background_large in the
+# batch CLI
+LARGE_IMAGE_PIXELS = 24_000_000
+
+# Per-pixel cost of one strip: RGB(A) crop, F and L alpha, filtered PNG
+# rows and the zlib input (mask only: F and L alpha, filtered rows)
+_STRIP_BYTES_PER_PIXEL = 18
+_MASK_STRIP_BYTES_PER_PIXEL = 8
+_DEFAULT_STRIP_BYTES = 16 * 1024 * 1024
+
+# Memory ceiling for remove_background_large (None: unbounded); set with
+# set_memory_ceiling or BG_REMOVER_MAX_MEMORY_MB
+_memory_ceiling = int(float(
+    os.environ.get("BG_REMOVER_MAX_MEMORY_MB", "0")) * 1024 * 1024) or None
+
+
+def set_memory_ceiling(max_bytes: int = None):
+    global _memory_ceiling
+    _memory_ceiling = max_bytes or None
+
+
+@instrumentation.operation("remove_background_large")
+def remove_background_large(image_path: str, output_path: str,
+                            model=None, max_memory: int = None,
+                            compress_level: int = 6,
+                            mask_only: bool = False) -> dict:
+    """Write the cutout of a very large image as PNG with bounded memory.
+
+    Only the decoded source is held at full size.  The alpha is resized,
+    attached and PNG-encoded in horizontal strips, as tall as *max_memory*
+    (default: the configured ceiling) allows; ``MemoryError`` is raised
+    before decoding if even one-row strips would not fit.  The ceiling
+    covers image buffers, not the model's own working memory.  With
+    *mask_only* the grayscale alpha is written instead; a JPEG source is
+    then never decoded at full size (other formats are, once, for the
+    model input).
+
+    Returns stats, including the estimated peak memory and the resident
+    size when the call started and at its sampled peak (after decoding
+    and after each strip; None where it cannot be read).
+    """
+    spec = _spec(model)
+    ceiling = max_memory or _memory_ceiling
+    start = time.perf_counter()
+    rss_before = peak_rss = instrumentation.current_rss()
+
+    with Image.open(image_path) as probe:
+        w, h = probe.size
+        # Pillow stores every multi-band mode at 4 bytes a pixel.  Only a
+        # JPEG is held in its own mode; others are loaded as RGB(A).
+        source_bpp = 1 if probe.format == "JPEG" and probe.mode == "L" \
+            else 4
+    # Model-resolution F mask
+    mask_bytes = spec.input_size[0] * spec.input_size[1] * 4
+    if mask_only:
+        source_bytes = 0
+        row_bytes = w * _MASK_STRIP_BYTES_PER_PIXEL
+    else:
+        source_bytes = w * h * source_bpp
+        row_bytes = w * _STRIP_BYTES_PER_PIXEL
+    if ceiling:
+        available = ceiling - source_bytes - mask_bytes
+        if available < row_bytes:
+            raise MemoryError(
+                f"{w}x{h} image needs at least "
+                f"{(source_bytes + mask_bytes + row_bytes) / 2**20:.0f} MB,"
+                f" ceiling is {ceiling / 2**20:.0f} MB"
+            )
+        rows = min(h, available // row_bytes)
+    else:
+        rows = min(h, max(1, _DEFAULT_STRIP_BYTES // row_bytes))
+
+    # A format without a reduced decode is decoded once, for the model
+    # and the strips alike
+    mask, _size, src = _source_mask(
+        image_path, _file_cache_key(image_path, model), spec,
+        keep=not mask_only)
+    mask_img = _mask_image(mask)
+    if src is None and not mask_only:
+        with _stage("decode"):
+            src = Image.open(image_path)
+            src.load()
+    peak_rss = _higher_rss(peak_rss)
+
+    tmp = output_path + ".tmp"
+    strips = 0
+    scale = mask_img.size[1] / h
+    with open(tmp, "wb") as f:
+        writer = _PngStripWriter(f, w, h, compress_level,
+                                 channels=1 if mask_only else 4)
+        for y0 in range(0, h, rows):
+            y1 = min(h, y0 + rows)
+            with _stage("composite"):
+                # Resizing a box of the mask gives exactly the rows a
+                # full resize would, filter support included
+                strip = mask_img.resize(
+                    (w, y1 - y0), MASK_RESAMPLE,
+                    box=(0, y0 * scale, mask_img.size[0], y1 * scale),
+                ).convert("L")
+                if not mask_only:
+                    alpha = strip
+                    strip = src.crop((0, y0, w, y1))
+                    if strip.mode != "RGBA":
+                        strip = strip.convert("RGBA")
+                    strip.putalpha(alpha)
+            with _stage("encode"):
+                writer.write(strip.tobytes())
+            peak_rss = _higher_rss(peak_rss)
+            strips += 1
+        with _stage("encode"):
+            writer.close()
+    os.replace(tmp, output_path)
+
+    return {
+        "width": w, "height": h, "strips": strips, "strip_rows": rows,
+        "seconds": time.perf_counter() - start,
+        "estimated_peak_bytes": source_bytes + mask_bytes + rows * row_bytes,
+        "rss_before_bytes": rss_before,
+        "peak_rss_bytes": peak_rss,
+    }
+
+
+def _higher_rss(peak):
+    """*peak* or the current resident size, whichever is higher.
+
+    Sampled instead of ``instrumentation.peak_rss``: that is the process's
+    lifetime high-water mark, which in a batch worker belongs to the
+    largest image it has processed so far.
+    """
+    rss = instrumentation.current_rss()
+    if rss is None or (peak is not None and peak >= rss):
+        return peak
+    return rss
+
+
+class _PngStripWriter:
+    """Streaming 8-bit RGBA (or, with ``channels=1``, grayscale) PNG
+    encoder, fed whole rows at a time.
+
+    Rows use the Sub filter, computed with numpy, and one zlib stream runs
+    across all strips, so the output is a regular single-image PNG.
+    """
+
+    _COLOR_TYPES = {1: 0, 4: 6}   # channels -> PNG colour type
+
+    def __init__(self, f, width: int, height: int, compress_level: int = 6,
+                 channels: int = 4):
+        self._f = f
+        self._bpp = channels
+        self._stride = width * channels
+        self._zlib = zlib.compressobj(compress_level)
+        f.write(b"\x89PNG\r\n\x1a\n")
+        self._chunk(b"IHDR", struct.pack(">IIBBBBB", width, height, 8,
+                                         self._COLOR_TYPES[channels], 0, 0, 0))
+
+    def write(self, data: bytes):
+        bpp = self._bpp
+        px = np.frombuffer(data, dtype=np.uint8).reshape(-1, self._stride)
+        out = np.empty((px.shape[0], self._stride + 1), dtype=np.uint8)
+        out[:, 0] = 1                       # filter type: Sub
+        out[:, 1:1 + bpp] = px[:, :bpp]
+        np.subtract(px[:, bpp:], px[:, :-bpp], out=out[:, 1 + bpp:])
+        self._idat(self._zlib.compress(out))
+
+    def close(self):
+        self._idat(self._zlib.flush())
+        self._chunk(b"IEND", b"")
+
+    def _idat(self, data: bytes):
+        if data:
+            self._chunk(b"IDAT", data)
+
+    def _chunk(self, kind: bytes, data: bytes):
+        self._f.write(struct.pack(">I", len(data)))
+        self._f.write(kind)
+        self._f.write(data)
+        self._f.write(struct.pack(">I", zlib.crc32(data, zlib.crc32(kind))))
+
+
+# =========================================================================
+# asyncio API
+# =========================================================================
+
+# Decode, inference and encode run as separate steps on one bounded
+# executor; at most _max_in_flight jobs per event loop hold images at once.
+_async_executor = None
+_async_workers = None     # None: min(8, CPU count)
+_max_in_flight = None     # None: twice the worker count
+_async_limits = weakref.WeakKeyDictionary()   # loop -> asyncio.Semaphore
+_async_lock = threading.Lock()
+
+
+def configure_async(max_workers: int = None, max_in_flight: int = None):
+    """Size the executor behind the ``*_async`` functions and cap how many
+    jobs may be in flight at once (later calls wait for a free slot).
+    Takes effect for jobs started afterwards."""
+    global _async_executor, _async_workers, _max_in_flight
+    with _async_lock:
+        old = _async_executor
+        _async_executor = None
+        _async_workers = max_workers
+        _max_in_flight = max_in_flight
+        _async_limits.clear()
+    if old is not None:
+        old.shutdown(wait=False)
+
+
+def _get_async_executor():
+    global _async_executor
+    with _async_lock:
+        if _async_executor is None:
+            from concurrent.futures import ThreadPoolExecutor
+            _async_executor = ThreadPoolExecutor(
+                _async_workers or min(8, os.cpu_count() or 1),
+                thread_name_prefix="bg_remover",
+            )
+        return _async_executor
+
+
+def _async_limit():
+    import asyncio
+    loop = asyncio.get_running_loop()
+    with _async_lock:
+        limit = _async_limits.get(loop)
+        if limit is None:
+            workers = _async_workers or min(8, os.cpu_count() or 1)
+            limit = _async_limits[loop] = asyncio.Semaphore(
+                _max_in_flight or 2 * workers)
+        return limit
+
+
+async def _in_executor(fn, *args):
+    """Await *fn* on the executor.
+
+    On cancellation a step that has not started is dropped; one already
+    running cannot be interrupted, so it is waited for before the
+    cancellation propagates (keeping the in-flight bound honest).
+    """
+    import asyncio
+    context = instrumentation.current_context()
+    if context is not None:
+        # Lets the step's stages reach this task's report
+        fn, args = context.run, (fn,) + args
+    cf = _get_async_executor().submit(fn, *args)
+    future = asyncio.wrap_future(cf)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        if not cf.cancel():
+            try:
+                await asyncio.shield(future)
+            except BaseException:
+                pass
+        raise
+
+
+async def remove_background_async(image_path: str, output_path: str = None,
+                                  model=None,
+                                  output_format=None) -> Image.Image:
+    """Awaitable ``remove_background``; cancellable between steps."""
+    fmt = _output(output_format)
+    async with _async_limit():
+        with instrumentation.measure("remove_background_async"):
+            cache_key = await _in_executor(_file_cache_key, image_path, model)
+            mask, size, image = await _in_executor(
+                _source_mask, image_path, cache_key, model,
+                fmt.kind != "mask")
+            result = await _in_executor(_result, image_path, mask, size, fmt,
+                                        image)
+            if output_path:
+                await _in_executor(fmt.save, result, output_path)
+            return result
+
+
+async def remove_background_from_bytes_async(image_bytes: bytes,
+                                             model=None,
+                                             output_format=None) -> bytes:
+    """Awaitable ``remove_background_from_bytes``; cancellable between
+    steps."""
+    fmt = _output(output_format)
+    async with _async_limit():
+        with instrumentation.measure("remove_background_from_bytes_async"):
+            cache_key = await _in_executor(_bytes_cache_key, image_bytes,
+                                           model)
+            mask, size, image = await _in_executor(
+                _source_mask, io.BytesIO(image_bytes), cache_key, model,
+                fmt.kind != "mask")
+            return await _in_executor(lambda: fmt.encode(_result(
+                io.BytesIO(image_bytes), mask, size, fmt, image)))
+
+
+def _finish(image: Image.Image, mask: np.ndarray) -> Image.Image:
+    """Resize *mask* to *image* and attach it in place."""
+    with _stage("postprocess"):
+        alpha = _postprocess(mask, image.size)
+    with _stage("composite"):
+        return _composite(image, alpha, inplace=True)
+
+
+# =========================================================================
+# Headless batch CLI  –  python -m bg_remover batch IN_DIR OUT_DIR
+# =========================================================================
+
+_IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+MANIFEST_NAME = ".bg_manifest.json"
+
+# Images per pool task; within a task each result is encoded while the
+# next image goes through the model
+_BATCH_CHUNK = 4
+
+
+_worker_model = None
+
+
+def _worker_init(threads: int, cache_dir: str = None, model: str = None,
+                 max_memory: int = None, output_format=None):
+    """Pool initializer: open one session per worker process and keep it."""
+    global _worker_model
+    if max_memory:
+        set_memory_ceiling(max_memory)
+    set_output_format(output_format)
+    set_session_config(get_session_config().replace(intra_op_threads=threads))
+    _worker_model = model
+    if cache_dir:
+        enable_mask_cache(cache_dir)
+    preload(model)
+
+
+def _worker_process(jobs: list) -> list:
+    """Process a chunk of ``(rel, src, dst)`` jobs into ``(rel, error)``."""
+    fmt = get_output_format()
+    results, pending = [], []
+    with Encoder() as encoder:
+        for rel, src, dst in jobs:
+            try:
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                with Image.open(src) as img:
+                    w, h = img.size
+                if fmt.kind != "webp" and (
+                        _memory_ceiling or w * h > LARGE_IMAGE_PIXELS):
+                    remove_background_large(
+                        src, dst, model=_worker_model,
+                        compress_level=fmt.compress_level,
+                        mask_only=fmt.kind == "mask")
+                    results.append((rel, None))
+                else:
+                    result = remove_background(src, model=_worker_model,
+                                               output_format=fmt)
+                    pending.append((rel, encoder.submit(result, dst, fmt)))
+            except Exception as e:
+                results.append((rel, str(e)))
+    for rel, future in pending:
+        error = future.exception()
+        results.append((rel, str(error) if error else None))
+    return results
+
+
+def _scan_images(in_dir: str) -> list:
+    found = []
+    for root, _dirs, files in os.walk(in_dir):
+        for name in files:
+            if name.lower().endswith(_IMAGE_EXTS):
+                found.append(os.path.relpath(os.path.join(root, name), in_dir))
+    return sorted(found)
+
+
+def _load_manifest(path: str) -> dict:
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _save_manifest(path: str, manifest: dict):
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=1, sort_keys=True)
+    os.replace(tmp, path)
+
+
+def _output_name(rel: str, fmt: OutputFormat) -> str:
+    return os.path.splitext(rel)[0] + fmt.extension
+
+
+def _source_key(path: str) -> dict:
+    st = os.stat(path)
+    return {"size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def run_batch(in_dir: str, out_dir: str, workers: int = None,
+              threads_per_worker: int = None, cache_dir: str = None,
+              model: str = None, max_memory: int = None,
+              output_format=None) -> dict:
+    """Process every image under *in_dir* into cutouts under *out_dir*,
+    encoded as *output_format* (default PNG).
+
+    Work is spread over a process pool; each worker loads its own session
+    once and writes results from a background thread while it runs the
+    next image.  Inputs already recorded in the manifest (same size and
+    mtime, same output format and model, output still present) are
+    skipped.  For PNG and mask output, images above LARGE_IMAGE_PIXELS,
+    or all images when a memory ceiling (*max_memory* or
+    BG_REMOVER_MAX_MEMORY_MB) is set, go through the strip-wise
+    ``remove_background_large``.  WebP cannot be written in strips, so a
+    ceiling with WebP output raises ``ValueError``.
+
+    Outputs are named after their source with the output extension, so
+    ``a.jpg`` and ``a.png`` side by side would both write ``a.png``;
+    ``ValueError`` is raised before anything is processed in that case.
+    """
+    from multiprocessing import Pool
+
+    fmt = _output(output_format)
+    if fmt.kind == "webp" and (max_memory or _memory_ceiling):
+        raise ValueError("a memory ceiling needs png or mask output; "
+                         "WebP cannot be encoded in strips")
+    if not check_model_exists(model):
+        raise FileNotFoundError(f"Model not found at {get_model_path(model)}")
+
+    cpus = os.cpu_count() or 1
+    workers = max(1, workers or cpus)
+    if threads_per_worker is None:
+        threads_per_worker = max(1, cpus // workers)
+
+    # An output only counts as done if it was made with these settings
+    settings = {"format": repr(fmt), "model": _spec(model).name}
+    os.makedirs(out_dir, exist_ok=True)
+    manifest_path = os.path.join(out_dir, MANIFEST_NAME)
+    manifest = _load_manifest(manifest_path)
+
+    sources = _scan_images(in_dir)
+    outputs = {}
+    for rel in sources:
+        outputs.setdefault(_output_name(rel, fmt), []).append(rel)
+    clashes = [" and ".join(rels) for rels in outputs.values()
+               if len(rels) > 1]
+    if clashes:
+        raise ValueError(f"{len(clashes)} output name(s) would be written "
+                         f"twice, e.g. from {clashes[0]}; rename the "
+                         f"sources so their names differ without extension")
+
+    jobs, skipped = [], 0
+    for rel in sources:
+        src = os.path.join(in_dir, rel)
+        dst = os.path.join(out_dir, _output_name(rel, fmt))
+        entry = manifest.get(rel)
+        if entry and entry.get("source") == _source_key(src) \
+                and entry.get("format") == settings["format"] \
+                and entry.get("model") == settings["model"] \
+                and os.path.isfile(dst):
+            skipped += 1
+            continue
+        jobs.append((rel, src, dst))
+
+    print(f"[BG Remover] {len(jobs)} to process, {skipped} already done, "
+          f"{workers} workers x {threads_per_worker} threads, {fmt}")
+
+    # Small chunks keep the workers evenly loaded
+    chunk = max(1, min(_BATCH_CHUNK, len(jobs) // workers))
+    chunks = [jobs[i:i + chunk] for i in range(0, len(jobs), chunk)]
+
+    done, failed = 0, 0
+    start = time.perf_counter()
+    if jobs:
+        with Pool(workers, initializer=_worker_init,
+                  initargs=(threads_per_worker, cache_dir, model,
+                            max_memory, fmt)) as pool:
+            for results in pool.imap_unordered(_worker_process, chunks):
+                for rel, err in results:
+                    if err:
+                        failed += 1
+                        print(f"[BG Remover] FAILED {rel}: {err}")
+                        continue
+                    done += 1
+                    manifest[rel] = dict(
+                        settings,
+                        source=_source_key(os.path.join(in_dir, rel)),
+                        output=_output_name(rel, fmt),
+                    )
+                    if done % 50 == 0:
+                        _save_manifest(manifest_path, manifest)
+        _save_manifest(manifest_path, manifest)
+    elapsed = time.perf_counter() - start
+
+    rate = done / elapsed if elapsed > 0 else 0.0
+    print(f"[BG Remover] {done} done, {failed} failed, {skipped} skipped "
+          f"in {elapsed:.1f}s ({rate:.2f} images/s)")
+    return {"done": done, "failed": failed, "skipped": skipped,
+            "seconds": elapsed, "images_per_second": rate}
+
+
+def main(argv=None) -> int:
+    import argparse
+
+    parser = argparse.ArgumentParser(prog="python -m bg_remover")
+    sub = parser.add_subparsers(dest="command", required=True)
+
+    batch = sub.add_parser("batch", help="remove backgrounds from a folder")
+    batch.add_argument("in_dir")
+    batch.add_argument("out_dir")
+    batch.add_argument("-j", "--workers", type=int, default=None,
+                       help="worker processes (default: CPU count)")
+    batch.add_argument("--threads-per-worker", type=int, default=None,
+                       help="ONNX intra-op threads per worker "
+                            "(default: CPU count / workers)")
+    batch.add_argument("--cache-dir", default=None,
+                       help="shared on-disk mask cache directory")
+    batch.add_argument("-m", "--model", default=MODEL_NAME,
+                       choices=sorted(MODELS), help="model to use")
+    batch.add_argument("--max-memory-mb", type=float, default=None,
+                       help="per-worker image memory ceiling; encodes "
+                            "in strips")
+    batch.add_argument("--format", default="png", type=OutputFormat.parse,
+                       help="png[:LEVEL], webp (lossless), webp:QUALITY "
+                            "(lossy) or mask[:LEVEL] (default: png)")
+
+    args = parser.parse_args(argv)
+    if args.command == "batch":
+        max_memory = int(args.max_memory_mb * 1024 * 1024) \
+            if args.max_memory_mb else None
+        try:
+            stats = run_batch(args.in_dir, args.out_dir, args.workers,
+                              args.threads_per_worker, args.cache_dir,
+                              args.model, max_memory, args.format)
+        except ValueError as e:
+            print(f"[ERROR] {e}")
+            return 2
+        return 1 if stats["failed"] else 0
+    return 2
 
-    # U2Net returns multiple outputs; the first (d1) is the best mask
-    mask = _postprocess(outputs[0], original_size)
 
-    rgba = image.convert("RGBA")
-    r, g, b, _ = rgba.split()
-    alpha = Image.fromarray(mask, mode="L")
-    return Image.merge("RGBA", (r, g, b, alpha))
+if __name__ == "__main__":
+    sys.exit(main())
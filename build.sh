@@ -47,9 +47,38 @@ download_model() {
         error "Model file not found at models/u2net.onnx"
     fi
     
+    # Optional: drop the unused side outputs (needs the onnx package)
+    if ! python3 prune_model.py; then
+        warn "Model pruning skipped – the full model will be bundled."
+    fi
+    
+    # Optional: fold normalisation into the graph (uint8 HWC input).
+    # The folded file replaces the others in the APK, see
+    # select_bundled_model.
+    if ! python3 fold_preprocess.py; then
+        # One left by an earlier build would still be picked and bundled
+        rm -f models/u2net_hwc_u8.onnx
+        warn "Preprocess folding skipped – normalisation stays in numpy."
+    fi
+    
     log "Model ready."
 }
 
+# ---- Step 1b: Pick the one model file to bundle ----
+# The app loads the most optimised file present for its model (see
+# bg_remover.get_model_path); only that file goes into the APK.  The
+# others stay in models/ as inputs for the next prune/fold.
+select_bundled_model() {
+    BUNDLED_MODEL=$(python3 -c "
+import os
+from model_registry import DEFAULT_MODEL, get_model_spec
+paths = get_model_spec(DEFAULT_MODEL).candidate_paths()
+print(os.path.relpath(next(p for p in paths if os.path.isfile(p))))")
+    # Overrides source.include_patterns in buildozer.spec
+    export APP_SOURCE_INCLUDE_PATTERNS="$BUNDLED_MODEL"
+    log "Bundling $BUNDLED_MODEL ($(du -h "$BUNDLED_MODEL" | cut -f1))"
+}
+
 # ---- Step 2: Check dependencies ----
 check_deps() {
     log "Checking build dependencies..."
@@ -74,6 +103,7 @@ check_deps() {
 build_apk() {
     local build_type="${1:-debug}"
     
+    select_bundled_model
     log "Building Android APK ($build_type)..."
     log "This may take a while on first build (downloads Android SDK/NDK)..."
     echo ""
@@ -6,7 +6,11 @@ package.name = backgroundremover
 package.domain = app.quantflow
 source.dir = .
 source.include_exts = py,png,jpg,jpeg,kv,atlas,onnx,txt
-source.include_patterns = models/*.onnx
+# Only the model file the app loads is bundled, not superseded copies or
+# quantize_model.py's INT8 files; build.sh swaps in the pruned/folded
+# file when it made one (APP_SOURCE_INCLUDE_PATTERNS)
+source.exclude_patterns = models/*.onnx
+source.include_patterns = models/u2net.onnx
 source.exclude_dirs = __pycache__,.git,.venv,venv,build,.buildozer,p4a-recipes,libs
 
 version = 1.0.0
@@ -1,17 +1,21 @@
 """
 Download the u2net ONNX model and the ONNX Runtime Android AAR.
 Run this before building the APK.
+
+Other registered models can be fetched by name:
+    python download_model.py u2netp isnet-general-use
 """
 
 import os
 import sys
 import urllib.request
 
+from model_registry import DEFAULT_MODEL, MODELS, get_model_spec
+
 # ── Model ──
-MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
-MODEL_NAME = "u2net"
-MODEL_FILE = os.path.join(MODEL_DIR, f"{MODEL_NAME}.onnx")
-MODEL_URL = f"https://github.com/danielgatis/rembg/releases/download/v0.0.0/{MODEL_NAME}.onnx"
+MODEL_NAME = DEFAULT_MODEL
+MODEL_FILE = get_model_spec(MODEL_NAME).path
+MODEL_URL = get_model_spec(MODEL_NAME).url
 
 # ── ONNX Runtime Android AAR ──
 LIBS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "libs")
@@ -67,9 +71,10 @@ def _download(url, dest, label):
         return False
 
 
-def download_model():
+def download_model(name=MODEL_NAME):
     """Download the ONNX model if not already present"""
-    return _download(MODEL_URL, MODEL_FILE, f"{MODEL_NAME}.onnx model")
+    spec = get_model_spec(name)
+    return _download(spec.url, spec.path, f"{spec.filename} model")
 
 
 def download_onnxruntime_aar():
@@ -78,6 +83,14 @@ def download_onnxruntime_aar():
 
 
 if __name__ == "__main__":
+    names = sys.argv[1:]
+    unknown = [n for n in names if n not in MODELS]
+    if unknown:
+        print(f"Unknown model(s): {', '.join(unknown)}")
+        print(f"Available: {', '.join(sorted(MODELS))}")
+        sys.exit(2)
+    if names:
+        sys.exit(0 if all([download_model(n) for n in names]) else 1)
     ok1 = download_model()
     ok2 = download_onnxruntime_aar()
     sys.exit(0 if (ok1 and ok2) else 1)
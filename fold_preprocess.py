@@ -0,0 +1,161 @@
+"""
+Fold the ImageNet preprocessing into the u2net ONNX graph.
+
+The rewritten model takes the raw ``uint8`` pixels straight from
+``np.array(img)`` as an ``(N, H, W, 3)`` tensor:
+
+    uint8 NHWC --Cast--> float NHWC --Transpose--> NCHW --Sub(255*mean)--> conv
+
+The ``1 / (255 * std)`` scale is folded into the weights of every first
+convolution, so only a per-channel subtraction is left in the graph.  The
+subtraction is kept (rather than folded into the bias) so that the
+convolution's zero padding still means "mean colour", exactly as with
+numpy-side normalisation.
+
+``bg_remover`` detects the uint8 input and skips its own normalisation.
+The rewritten model is written to ``models/<model>_hwc_u8.onnx`` and is
+preferred over the float models when present.  Mean/std come from the
+model registry.
+
+Desktop-only tool: requires the ``onnx`` package (pip install onnx).
+Run after download_model.py (and optionally prune_model.py):
+
+    python fold_preprocess.py [model ...]     (default: u2net)
+"""
+
+import os
+import sys
+
+import numpy as np
+
+from model_registry import DEFAULT_MODEL, IMAGENET_MEAN, IMAGENET_STD, \
+    get_model_spec
+
+
+def fold_preprocess(model, mean=IMAGENET_MEAN, std=IMAGENET_STD):
+    """Rewrite *model* in place to accept uint8 NHWC input.
+
+    Returns the number of convolutions whose weights were rescaled.
+    """
+    from onnx import TensorProto, helper, numpy_helper
+
+    mean = np.asarray(mean, dtype=np.float32)
+    std = np.asarray(std, dtype=np.float32)
+
+    graph = model.graph
+    inp = graph.input[0]
+    name = inp.name
+    dims = list(inp.type.tensor_type.shape.dim)
+    if len(dims) != 4 or dims[1].dim_value != 3:
+        raise ValueError(f"expected an (N, 3, H, W) input, got {dims}")
+
+    inits = {t.name: t for t in graph.initializer}
+    consumers = [n for n in graph.node if name in n.input]
+    scale = (1.0 / (255.0 * std)).astype(np.float32)
+
+    foldable = all(
+        n.op_type == "Conv" and n.input[0] == name and n.input[1] in inits
+        and all(a.name != "group" or a.i == 1 for a in n.attribute)
+        for n in consumers
+    )
+    if foldable:
+        for node in consumers:
+            w = numpy_helper.to_array(inits[node.input[1]])
+            w = (w * scale[None, :, None, None]).astype(w.dtype)
+            # Fresh initializer per conv in case the weight is shared
+            w_name = node.input[1] + "_prescaled"
+            graph.initializer.append(numpy_helper.from_array(w, w_name))
+            node.input[1] = w_name
+
+    # New uint8 NHWC graph input replacing the float NCHW one
+    new_input = helper.make_tensor_value_info(
+        name + "_hwc_u8", TensorProto.UINT8,
+        [_dim_value(dims[0]), _dim_value(dims[2]),
+         _dim_value(dims[3]), 3],
+    )
+    centred = name + "_centred"
+    pre = [
+        helper.make_node("Cast", [new_input.name], [name + "_f32"],
+                         to=TensorProto.FLOAT),
+        helper.make_node("Transpose", [name + "_f32"], [name + "_nchw"],
+                         perm=[0, 3, 1, 2]),
+        helper.make_node("Sub", [name + "_nchw", name + "_mean255"],
+                         [centred]),
+    ]
+    graph.initializer.append(numpy_helper.from_array(
+        (mean * 255.0).astype(np.float32).reshape(1, 3, 1, 1),
+        name + "_mean255",
+    ))
+    if not foldable:
+        # Could not fold: apply the scale as an explicit Mul instead
+        pre.append(helper.make_node(
+            "Mul", [centred, name + "_scale"], [centred + "_scaled"]))
+        graph.initializer.append(numpy_helper.from_array(
+            scale.reshape(1, 3, 1, 1), name + "_scale"))
+        centred += "_scaled"
+
+    for node in consumers:
+        for i, value in enumerate(node.input):
+            if value == name:
+                node.input[i] = centred
+
+    nodes = pre + list(graph.node)
+    del graph.node[:]
+    graph.node.extend(nodes)
+    del graph.input[0]
+    graph.input.insert(0, new_input)
+
+    # Old weights may now be unused
+    used = {i for n in graph.node for i in n.input}
+    live = [t for t in graph.initializer if t.name in used]
+    del graph.initializer[:]
+    graph.initializer.extend(live)
+
+    return len(consumers) if foldable else 0
+
+
+def _dim_value(dim):
+    if dim.HasField("dim_value"):
+        return dim.dim_value
+    return dim.dim_param or None
+
+
+def main(name=DEFAULT_MODEL, src=None, dst=None):
+    try:
+        import onnx
+    except ImportError:
+        print("[ERROR] The 'onnx' package is required: pip install onnx")
+        return False
+
+    spec = get_model_spec(name)
+    if src is None:
+        src = spec.pruned_path if os.path.isfile(spec.pruned_path) \
+            else spec.path
+    dst = dst or spec.folded_path
+    if not os.path.isfile(src):
+        print(f"[ERROR] Model not found: {src}")
+        print("  Run download_model.py first.")
+        return False
+
+    print(f"Folding preprocessing into {os.path.basename(src)} ...")
+    model = onnx.load(src)
+    folded = fold_preprocess(model, spec.mean, spec.std)
+    onnx.checker.check_model(model)
+
+    tmp = dst + ".tmp"
+    onnx.save(model, tmp)
+    os.replace(tmp, dst)
+
+    if folded:
+        print(f"  Scaled weights of {folded} input convolution(s)")
+    else:
+        print("  Input is not consumed by plain convolutions only – "
+              "kept an explicit scale")
+    print(f"[OK] {dst}")
+    return True
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or [DEFAULT_MODEL]
+    ok = all([main(name) for name in names])
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,283 @@
+"""
+Timing and memory instrumentation for bg_remover.
+
+Each public bg_remover call is one *operation*; inside it the pipeline
+marks *stages* (decode, preprocess, inference, postprocess, composite,
+encode, ...).  When something is listening, every operation produces a
+:class:`Report` with per-stage milliseconds, optionally peak memory and a
+cProfile capture, and hands it to the listeners::
+
+    import instrumentation
+    instrumentation.add_listener(lambda r: print(r.summary()))
+    instrumentation.configure(memory="rss", profile=False)
+
+or, to get the reports of a block of code on the calling side::
+
+    with instrumentation.collect() as reports:
+        bg_remover.remove_background(path)
+    print(reports[-1].stages)
+
+With no listener and no ``collect`` block active, ``operation`` and
+``stage`` reduce to a flag test and a shared no-op context manager.
+
+Memory modes: ``"tracemalloc"`` reports the peak of Python-level
+allocations (numpy included, but not Pillow's or ONNX Runtime's own
+buffers) and slows allocation-heavy code; ``"rss"`` reports the
+process's resident set size before/after and its high-water mark.
+"""
+
+import contextlib
+import contextvars
+import functools
+import os
+import sys
+import threading
+import time
+
+_listeners = []
+_memory_mode = None      # None, "rss" or "tracemalloc"
+_profile = False
+_active = False          # any listener or collect() block?
+_collecting = 0
+_lock = threading.Lock()
+
+_current = contextvars.ContextVar("bg_remover_report", default=None)
+_collector = contextvars.ContextVar("bg_remover_collector", default=None)
+
+_NULL = contextlib.nullcontext()
+
+MEMORY_MODES = (None, "rss", "tracemalloc")
+
+
+class Report:
+    """Measurements of one operation."""
+
+    def __init__(self, operation: str):
+        self.operation = operation
+        self.stages = {}           # stage -> milliseconds (summed)
+        self.total_ms = 0.0
+        self.memory = {}           # filled according to the memory mode
+        self.profile = None        # cProfile.Profile when profiling
+        self.error = None
+
+    def add(self, stage: str, ms: float):
+        self.stages[stage] = self.stages.get(stage, 0.0) + ms
+
+    def summary(self, limit: int = 4) -> str:
+        """Short text such as ``"1.24 s: inference 812 ms, decode 95 ms"``."""
+        parts = sorted(self.stages.items(), key=lambda kv: -kv[1])[:limit]
+        text = f"{self.total_ms / 1000.0:.2f} s"
+        if parts:
+            text += ": " + ", ".join(f"{k} {v:.0f} ms" for k, v in parts)
+        peak = self.memory.get("peak_bytes")
+        if peak:
+            text += f", peak {peak / 2**20:.0f} MB"
+        return text
+
+    def as_dict(self) -> dict:
+        return {"operation": self.operation, "total_ms": self.total_ms,
+                "stages": dict(self.stages), "memory": dict(self.memory),
+                "error": self.error}
+
+    def __repr__(self):
+        return f"Report({self.operation!r}, {self.summary()})"
+
+
+# ---------------------------------------------------------------------------
+# Configuration
+# ---------------------------------------------------------------------------
+
+def add_listener(listener):
+    """Call ``listener(report)`` after every operation."""
+    with _lock:
+        _listeners.append(listener)
+        _update_active()
+    return listener
+
+
+def remove_listener(listener):
+    with _lock:
+        if listener in _listeners:
+            _listeners.remove(listener)
+        _update_active()
+
+
+def configure(memory: str = None, profile: bool = False):
+    """Choose the memory sampling mode and toggle cProfile capture."""
+    global _memory_mode, _profile
+    if memory not in MEMORY_MODES:
+        raise ValueError(f"memory must be one of {MEMORY_MODES}")
+    if memory == "tracemalloc":
+        import tracemalloc
+        if not tracemalloc.is_tracing():
+            tracemalloc.start()
+    elif _memory_mode == "tracemalloc":
+        import tracemalloc
+        tracemalloc.stop()
+    _memory_mode = memory
+    _profile = bool(profile)
+
+
+@contextlib.contextmanager
+def collect():
+    """Collect the reports of operations run inside the block (in this
+    thread or task) into the yielded list."""
+    global _collecting
+    reports = []
+    token = _collector.set(reports)
+    with _lock:
+        _collecting += 1
+        _update_active()
+    try:
+        yield reports
+    finally:
+        _collector.reset(token)
+        with _lock:
+            _collecting -= 1
+            _update_active()
+
+
+def _update_active():
+    global _active
+    _active = bool(_listeners) or _collecting > 0
+
+
+# ---------------------------------------------------------------------------
+# Hooks used by bg_remover
+# ---------------------------------------------------------------------------
+
+def operation(name: str):
+    """Decorator: measure every call of the function as one operation.
+
+    Calls made inside another operation only add to the outer report.
+    """
+    def decorate(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            if not _active or _current.get() is not None:
+                return fn(*args, **kwargs)
+            with measure(name):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+@contextlib.contextmanager
+def measure(name: str):
+    """Measure the block as operation *name* and publish its report."""
+    if not _active or _current.get() is not None:
+        yield _current.get()
+        return
+
+    report = Report(name)
+    token = _current.set(report)
+    memory_before = _memory_start()
+    profiler = None
+    if _profile:
+        import cProfile
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:          # another profiler is already active
+            profiler = None
+    start = time.perf_counter()
+    try:
+        yield report
+    except BaseException as e:
+        report.error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        report.total_ms = (time.perf_counter() - start) * 1000.0
+        if profiler is not None:
+            profiler.disable()
+            report.profile = profiler
+        report.memory = _memory_end(memory_before)
+        _current.reset(token)
+        _publish(report)
+
+
+def stage(name: str):
+    """Context manager timing one stage of the current operation."""
+    report = _current.get() if _active else None
+    if report is None:
+        return _NULL
+    return _Stage(report, name)
+
+
+def current_context():
+    """Context to run executor steps in so their stages reach the report."""
+    return contextvars.copy_context() if _active else None
+
+
+class _Stage:
+    __slots__ = ("_report", "_name", "_start")
+
+    def __init__(self, report: Report, name: str):
+        self._report = report
+        self._name = name
+
+    def __enter__(self):
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self._report.add(self._name,
+                         (time.perf_counter() - self._start) * 1000.0)
+
+
+def _publish(report: Report):
+    reports = _collector.get()
+    if reports is not None:
+        reports.append(report)
+    for listener in list(_listeners):
+        try:
+            listener(report)
+        except Exception as e:
+            print(f"[BG Remover] Instrumentation listener failed: {e}")
+
+
+# ---------------------------------------------------------------------------
+# Memory sampling
+# ---------------------------------------------------------------------------
+
+def _memory_start():
+    if _memory_mode == "tracemalloc":
+        import tracemalloc
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+            return tracemalloc.get_traced_memory()[0]
+    elif _memory_mode == "rss":
+        return current_rss()
+    return None
+
+
+def _memory_end(before) -> dict:
+    if _memory_mode == "tracemalloc":
+        import tracemalloc
+        if before is None or not tracemalloc.is_tracing():
+            return {}
+        current, peak = tracemalloc.get_traced_memory()
+        return {"mode": "tracemalloc", "peak_bytes": peak - before,
+                "retained_bytes": current - before}
+    if _memory_mode == "rss":
+        return {"mode": "rss", "rss_before": before,
+                "rss_after": current_rss(), "peak_bytes": peak_rss()}
+    return {}
+
+
+def current_rss():
+    """Current resident set size in bytes (Linux/Android), or None."""
+    try:
+        with open("/proc/self/statm", "r") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def peak_rss():
+    """High-water resident set size of this process in bytes, or None."""
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == "darwin" else peak * 1024
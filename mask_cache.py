@@ -0,0 +1,135 @@
+"""
+Content-addressed on-disk cache for U2Net masks.
+
+Entries are the raw model-resolution mask (float16 ``.npy``), not the
+full-size RGBA result, keyed by a hash of the input plus the model
+identity.  The cache is bounded in bytes and evicts least-recently-used
+entries (by file mtime, refreshed on every hit).
+
+Writes go to a temporary file that is atomically renamed into place, and
+every reader/evictor tolerates files disappearing underneath it, so
+several processes can share one cache directory without a lock.
+"""
+
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Re-scan the directory for eviction after this many writes even if the
+# in-process size estimate says we are under the limit (other processes
+# may be writing too).
+_RESCAN_EVERY = 64
+
+
+class MaskCache:
+    """Size-bounded LRU mask store shared between processes."""
+
+    def __init__(self, directory: str, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = int(max_bytes)
+        self._approx_bytes = None
+        self._writes = 0
+        os.makedirs(directory, exist_ok=True)
+
+    # -- keys --
+
+    @staticmethod
+    def key(data, model_id: str) -> str:
+        """Hash *data* (bytes-like) together with the model identity."""
+        h = hashlib.sha256()
+        h.update(model_id.encode("utf-8"))
+        h.update(b"\0")
+        h.update(data)
+        return h.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.directory, key[:2], key + ".npy")
+
+    # -- lookup / store --
+
+    def get(self, key: str):
+        """Return the cached mask for *key*, or ``None`` on a miss."""
+        path = self._path(key)
+        try:
+            mask = np.load(path, allow_pickle=False)
+        except (OSError, ValueError):
+            return None
+        try:
+            os.utime(path)  # mark as recently used
+        except OSError:
+            pass
+        return mask
+
+    def put(self, key: str, mask: np.ndarray) -> np.ndarray:
+        """Store *mask* and return it as stored, so that callers using the
+        fresh result see exactly what a later cache hit would return."""
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        data = np.ascontiguousarray(np.squeeze(mask), dtype=np.float16)
+
+        fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                np.save(f, data, allow_pickle=False)
+            os.replace(tmp, path)
+        except OSError:
+            try:
+                os.remove(tmp)
+            except OSError:
+                pass
+            return data
+
+        self._writes += 1
+        if self._approx_bytes is not None:
+            self._approx_bytes += os.path.getsize(path)
+        if (self._approx_bytes is None
+                or self._approx_bytes > self.max_bytes
+                or self._writes % _RESCAN_EVERY == 0):
+            self._evict()
+        return data
+
+    # -- maintenance --
+
+    def _entries(self) -> list:
+        entries = []
+        for root, _dirs, files in os.walk(self.directory):
+            for name in files:
+                if not name.endswith(".npy"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime_ns, st.st_size, path))
+        return entries
+
+    def _evict(self):
+        entries = self._entries()
+        total = sum(size for _, size, _ in entries)
+        if total > self.max_bytes:
+            entries.sort()  # oldest first
+            for _mtime, size, path in entries:
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except OSError:
+                    continue
+                total -= size
+        self._approx_bytes = total
+
+    def size_bytes(self) -> int:
+        return sum(size for _, size, _ in self._entries())
+
+    def clear(self):
+        for _mtime, _size, path in self._entries():
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+        self._approx_bytes = 0
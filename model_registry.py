@@ -0,0 +1,115 @@
+"""
+Registry of background-removal models.
+
+Each entry declares where its ONNX file lives and what its input/output
+contract is, so ``bg_remover`` can run several models side by side.
+Kept free of Kivy/numpy imports so the offline tools can use it too.
+"""
+
+import os
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "models")
+
+_REMBG_RELEASE = "https://github.com/danielgatis/rembg/releases/download/v0.0.0"
+
+IMAGENET_MEAN = (0.485, 0.456, 0.406)
+IMAGENET_STD = (0.229, 0.224, 0.225)
+
+
+class ModelSpec:
+    """Input/output contract of one model."""
+
+    def __init__(self, name: str, input_size=(320, 320),
+                 mean=IMAGENET_MEAN, std=IMAGENET_STD, output_index: int = 0,
+                 filename: str = None, url: str = None,
+                 description: str = ""):
+        self.name = name
+        self.input_size = tuple(input_size)    # (W, H)
+        self.mean = tuple(mean)
+        self.std = tuple(std)
+        self.output_index = output_index       # which output is the mask
+        self.filename = filename or f"{name}.onnx"
+        # None: published with rembg; "": generated locally, no download
+        self.url = f"{_REMBG_RELEASE}/{self.filename}" if url is None else url
+        self.description = description
+
+    @property
+    def path(self) -> str:
+        return os.path.join(MODEL_DIR, self.filename)
+
+    @property
+    def pruned_path(self) -> str:
+        """Written by prune_model.py (only the mask output kept)."""
+        return os.path.join(MODEL_DIR, f"{self._stem}_d1.onnx")
+
+    @property
+    def folded_path(self) -> str:
+        """Written by fold_preprocess.py (uint8 NHWC input)."""
+        return os.path.join(MODEL_DIR, f"{self._stem}_hwc_u8.onnx")
+
+    @property
+    def _stem(self) -> str:
+        return os.path.splitext(self.filename)[0]
+
+    def candidate_paths(self) -> list:
+        """Files to try, most optimised first."""
+        return [self.folded_path, self.pruned_path, self.path]
+
+    def __repr__(self):
+        return f"ModelSpec({self.name!r}, input_size={self.input_size})"
+
+
+MODELS = {}
+
+
+def register_model(spec: ModelSpec) -> ModelSpec:
+    MODELS[spec.name] = spec
+    return spec
+
+
+QUANT_MODES = ("dynamic", "static")
+
+
+def quantized_variant(spec: ModelSpec, mode: str) -> ModelSpec:
+    """Spec for the INT8 file quantize_model.py writes for *spec*."""
+    stem = os.path.splitext(spec.filename)[0]
+    return ModelSpec(
+        f"{spec.name}-int8-{mode}", spec.input_size, spec.mean, spec.std,
+        output_index=spec.output_index,
+        filename=f"{stem}_int8_{mode}.onnx", url="",
+        description=f"{spec.name}, {mode} INT8 (quantize_model.py)",
+    )
+
+
+def get_model_spec(name: str) -> ModelSpec:
+    try:
+        return MODELS[name]
+    except KeyError:
+        raise KeyError(
+            f"Unknown model {name!r}; available: {', '.join(sorted(MODELS))}"
+        ) from None
+
+
+DEFAULT_MODEL = "u2net"
+
+register_model(ModelSpec(
+    "u2net", description="General purpose, best quality (176 MB)"))
+register_model(ModelSpec(
+    "u2netp", description="Lightweight U2Net (4.7 MB)"))
+register_model(ModelSpec(
+    "u2net_human_seg", description="U2Net trained for people (176 MB)"))
+register_model(ModelSpec(
+    "silueta", description="U2Net pruned to 43 MB, near u2net quality"))
+register_model(ModelSpec(
+    "isnet-general-use", input_size=(1024, 1024),
+    mean=(0.5, 0.5, 0.5), std=(1.0, 1.0, 1.0),
+    description="IS-Net general use, high quality at 1024 px (179 MB)"))
+register_model(ModelSpec(
+    "isnet-anime", input_size=(1024, 1024),
+    mean=(0.5, 0.5, 0.5), std=(1.0, 1.0, 1.0),
+    description="IS-Net for anime/illustration (176 MB)"))
+
+# INT8 variants of every model above, produced locally by quantize_model.py
+for _base in list(MODELS.values()):
+    for _mode in QUANT_MODES:
+        register_model(quantized_variant(_base, _mode))
@@ -0,0 +1,94 @@
+"""
+Prune the u2net ONNX model down to the single output the app uses.
+
+U2Net returns the fused mask plus six side outputs, each behind its own
+sigmoid; ``bg_remover`` only reads the first one.  This writes
+``models/<model>_d1.onnx`` exposing only the registry's mask output, with
+every node and initializer that no longer contributes to it removed.
+``bg_remover`` picks the pruned file up automatically when it is present.
+
+Desktop-only tool: requires the ``onnx`` package (pip install onnx).
+Run after download_model.py:
+
+    python prune_model.py [model ...]     (default: u2net)
+"""
+
+import os
+import sys
+
+from model_registry import DEFAULT_MODEL, get_model_spec
+
+
+def prune_graph(model, keep_index=0):
+    """Keep only graph output *keep_index* and drop dead nodes.
+
+    Returns ``(nodes_removed, initializers_removed)``.
+    """
+    graph = model.graph
+    kept = [graph.output[keep_index]]
+    del graph.output[:]
+    graph.output.extend(kept)
+
+    # Walk backwards from the kept outputs marking every value they need
+    needed = {o.name for o in kept}
+    live_nodes = []
+    for node in reversed(graph.node):
+        if any(out in needed for out in node.output):
+            live_nodes.append(node)
+            needed.update(i for i in node.input if i)
+    live_nodes.reverse()
+
+    nodes_removed = len(graph.node) - len(live_nodes)
+    del graph.node[:]
+    graph.node.extend(live_nodes)
+
+    live_inits = [t for t in graph.initializer if t.name in needed]
+    inits_removed = len(graph.initializer) - len(live_inits)
+    del graph.initializer[:]
+    graph.initializer.extend(live_inits)
+
+    live_info = [v for v in graph.value_info if v.name in needed]
+    del graph.value_info[:]
+    graph.value_info.extend(live_info)
+
+    return nodes_removed, inits_removed
+
+
+def prune_model(name=DEFAULT_MODEL, src=None, dst=None):
+    """Write a pruned copy of model *name* (or of *src*) to *dst*."""
+    try:
+        import onnx
+    except ImportError:
+        print("[ERROR] The 'onnx' package is required: pip install onnx")
+        return False
+
+    spec = get_model_spec(name)
+    src = src or spec.path
+    dst = dst or spec.pruned_path
+    if not os.path.isfile(src):
+        print(f"[ERROR] Model not found: {src}")
+        print("  Run download_model.py first.")
+        return False
+
+    print(f"Pruning {os.path.basename(src)} ...")
+    model = onnx.load(src)
+    outputs = [o.name for o in model.graph.output]
+    nodes, inits = prune_graph(model, spec.output_index)
+    onnx.checker.check_model(model)
+
+    tmp = dst + ".tmp"
+    onnx.save(model, tmp)
+    os.replace(tmp, dst)
+
+    src_mb = os.path.getsize(src) / (1024 * 1024)
+    dst_mb = os.path.getsize(dst) / (1024 * 1024)
+    print(f"  Outputs: {outputs} -> {[o.name for o in model.graph.output]}")
+    print(f"  Removed {nodes} nodes, {inits} initializers")
+    print(f"[OK] {dst} ({src_mb:.1f} MB -> {dst_mb:.1f} MB)")
+    return True
+
+
+if __name__ == "__main__":
+    names = sys.argv[1:] or [DEFAULT_MODEL]
+    ok = all([prune_model(name) for name in names])
+    sys.exit(0 if ok else 1)
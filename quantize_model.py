@@ -0,0 +1,240 @@
+"""
+Produce INT8 variants of a model and report accuracy, latency and size.
+
+Writes, next to the float model:
+    models/<model>_int8_dynamic.onnx   weights INT8, activations quantised
+                                       on the fly (no calibration needed)
+    models/<model>_int8_static.onnx    weights and activations INT8 (QDQ),
+                                       calibrated on local images
+
+Then compares each variant with the float model on the evaluation images:
+mask IoU (at 0.5) and MAE on min-max normalised masks, median CPU latency
+of one ``session.run`` and file size.  The variants are registered in
+model_registry as ``<model>-int8-dynamic`` / ``<model>-int8-static`` and
+can be selected with ``model=`` like any other model.
+
+Desktop-only tool: requires ``onnx`` and ``onnxruntime``.
+
+    python quantize_model.py --calib-dir photos/ [--model u2net]
+                             [--modes dynamic static] [--json report.json]
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+import numpy as np
+from PIL import Image
+
+from model_registry import DEFAULT_MODEL, QUANT_MODES, get_model_spec, \
+    quantized_variant
+
+_IMAGE_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp")
+
+
+def _list_images(directory: str, limit: int) -> list:
+    if not directory or not os.path.isdir(directory):
+        return []
+    names = sorted(n for n in os.listdir(directory)
+                   if n.lower().endswith(_IMAGE_EXTS))
+    return [os.path.join(directory, n) for n in names[:limit]]
+
+
+def _load_tensors(paths: list, spec) -> list:
+    from bg_remover import _preprocess
+    tensors = []
+    for path in paths:
+        with Image.open(path) as img:
+            tensors.append(_preprocess(img, spec=spec))
+    return tensors
+
+
+class _CalibrationReader:
+    """Feeds preprocessed images to ``quantize_static``."""
+
+    def __init__(self, input_name: str, tensors: list):
+        self._input_name = input_name
+        self._iter = iter(tensors)
+
+    def get_next(self):
+        tensor = next(self._iter, None)
+        return None if tensor is None else {self._input_name: tensor}
+
+    def rewind(self):
+        pass
+
+
+def _float_source(spec) -> str:
+    # Quantise the pruned graph when available: fewer ops to calibrate
+    return spec.pruned_path if os.path.isfile(spec.pruned_path) else spec.path
+
+
+def quantize(spec, mode: str, calib_tensors: list) -> str:
+    """Write the *mode* INT8 variant of *spec* and return its path."""
+    from onnxruntime.quantization import (
+        QuantFormat, QuantType, quantize_dynamic, quantize_static,
+    )
+
+    src = _float_source(spec)
+    dst = quantized_variant(spec, mode).path
+    tmp = dst + ".tmp.onnx"
+
+    if mode == "dynamic":
+        quantize_dynamic(src, tmp, weight_type=QuantType.QInt8)
+    elif mode == "static":
+        if not calib_tensors:
+            raise ValueError("static quantisation needs --calib-dir images")
+        import onnx
+        input_name = onnx.load(src, load_external_data=False) \
+            .graph.input[0].name
+        quantize_static(
+            src, tmp, _CalibrationReader(input_name, calib_tensors),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+        )
+    else:
+        raise ValueError(f"unknown mode {mode!r}")
+
+    os.replace(tmp, dst)
+    return dst
+
+
+# ---------------------------------------------------------------------------
+# Comparison
+# ---------------------------------------------------------------------------
+
+def _open(path: str):
+    import onnxruntime as ort
+    opts = ort.SessionOptions()
+    opts.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    return ort.InferenceSession(path, sess_options=opts,
+                                providers=["CPUExecutionProvider"])
+
+
+def _mask(session, tensor: np.ndarray) -> np.ndarray:
+    name = session.get_inputs()[0].name
+    out = np.squeeze(session.run([session.get_outputs()[0].name],
+                                 {name: tensor})[0]).astype(np.float32)
+    mi, ma = out.min(), out.max()
+    return (out - mi) / (ma - mi) if ma - mi > 1e-6 else np.zeros_like(out)
+
+
+def _latency_ms(session, tensor: np.ndarray, runs: int) -> float:
+    name = session.get_inputs()[0].name
+    feed = {name: tensor}
+    for _ in range(2):
+        session.run(None, feed)
+    times = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        session.run(None, feed)
+        times.append((time.perf_counter() - start) * 1000.0)
+    return float(np.median(times))
+
+
+def compare(paths: dict, eval_tensors: list, runs: int, spec) -> list:
+    """Rows of ``{variant, size_mb, latency_ms, iou, mae}``; the first
+    entry of *paths* is the float reference."""
+    if not eval_tensors:
+        w, h = spec.input_size
+        eval_tensors = [np.random.default_rng(0).standard_normal(
+            (1, 3, h, w)).astype(np.float32)]
+
+    ref_name = next(iter(paths))
+    ref = _open(paths[ref_name])
+    ref_masks = [_mask(ref, t) for t in eval_tensors]
+
+    rows = []
+    for variant, path in paths.items():
+        sess = ref if variant == ref_name else _open(path)
+        ious, maes = [], []
+        for tensor, ref_mask in zip(eval_tensors, ref_masks):
+            m = _mask(sess, tensor)
+            a, b = m >= 0.5, ref_mask >= 0.5
+            union = np.logical_or(a, b).sum()
+            ious.append(np.logical_and(a, b).sum() / union if union else 1.0)
+            maes.append(float(np.abs(m - ref_mask).mean()))
+        rows.append({
+            "variant": variant,
+            "path": path,
+            "size_mb": os.path.getsize(path) / (1024 * 1024),
+            "latency_ms": _latency_ms(sess, eval_tensors[0], runs),
+            "iou": float(np.mean(ious)),
+            "mae": float(np.mean(maes)),
+        })
+    return rows
+
+
+def _print_report(rows: list):
+    print()
+    print(f"{'variant':<10} {'size MB':>8} {'latency ms':>11} "
+          f"{'IoU':>7} {'MAE':>8}")
+    for r in rows:
+        print(f"{r['variant']:<10} {r['size_mb']:>8.1f} {r['latency_ms']:>11.1f} "
+              f"{r['iou']:>7.4f} {r['mae']:>8.5f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--calib-dir", help="images for static calibration")
+    parser.add_argument("--calib-count", type=int, default=64)
+    parser.add_argument("--eval-dir",
+                        help="images for the comparison (default: calib set)")
+    parser.add_argument("--modes", nargs="+", choices=QUANT_MODES,
+                        default=list(QUANT_MODES))
+    parser.add_argument("--runs", type=int, default=20,
+                        help="timed runs per variant")
+    parser.add_argument("--json", help="write the report to this file")
+    args = parser.parse_args(argv)
+
+    try:
+        import onnx  # noqa: F401  (needed by the quantiser)
+        import onnxruntime.quantization  # noqa: F401
+    except ImportError:
+        print("[ERROR] 'onnx' and 'onnxruntime' are required: "
+              "pip install onnx onnxruntime")
+        return 1
+
+    spec = get_model_spec(args.model)
+    src = _float_source(spec)
+    if not os.path.isfile(src):
+        print(f"[ERROR] Model not found: {src}")
+        print("  Run download_model.py first.")
+        return 1
+
+    calib_paths = _list_images(args.calib_dir, args.calib_count)
+    calib = _load_tensors(calib_paths, spec)
+    eval_paths = _list_images(args.eval_dir, args.calib_count) \
+        if args.eval_dir else calib_paths
+    evals = calib if eval_paths is calib_paths else \
+        _load_tensors(eval_paths, spec)
+    print(f"{len(calib)} calibration / {len(evals)} evaluation images")
+
+    paths = {"float": src}
+    for mode in args.modes:
+        if mode == "static" and not calib:
+            print("[WARN] static: no calibration images – skipped")
+            continue
+        print(f"Quantising ({mode}) {os.path.basename(src)} ...")
+        paths[mode] = quantize(spec, mode, calib)
+        print(f"[OK] {paths[mode]}")
+
+    rows = compare(paths, evals, args.runs, spec)
+    _print_report(rows)
+    if not evals:
+        print("(no evaluation images: IoU/MAE measured on random input)")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": spec.name, "images": len(evals),
+                       "results": rows}, f, indent=2)
+        print(f"Report written to {args.json}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
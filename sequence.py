@@ -0,0 +1,326 @@
+"""
+Background removal for image sequences and video, with temporal reuse.
+
+Consecutive frames of a clip are mostly alike, so the model does not have
+to see every one of them.  Each frame is reduced to a small grayscale
+signature; while it stays within ``threshold`` of the last frame the
+model actually ran on (the keyframe), that keyframe's mask is reused –
+shifted by the global translation found by phase correlation, so slow
+pans still line up.  Masks are smoothed over time with an exponential
+moving average, which also removes the flicker U2Net shows on video.
+
+Frames come from any iterable of ``(name, PIL image)`` pairs, so other
+decoders plug in directly.  Two are provided: numbered image files in a
+folder, and video through ``ffmpeg`` (which must be on PATH).
+
+    python sequence.py IN OUT [--mask-only] [--threshold 2.0]
+                       [--smoothing 0.6] [--max-reuse 12] [--model u2net]
+
+IN is a folder of frames or a video file; OUT receives one PNG per frame.
+"""
+
+import argparse
+import json
+import os
+import re
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+from PIL import Image
+
+from bg_remover import apply_alpha, mask_to_alpha, predict_mask, \
+    resolve_model, MODEL_NAME, MODELS
+
+# Side of the square grayscale signature used to compare frames
+SIGNATURE_SIZE = 64
+
+_FRAME_EXTS = (".png", ".jpg", ".jpeg", ".webp", ".bmp", ".tif", ".tiff")
+
+
+# ---------------------------------------------------------------------------
+# Frame sources
+# ---------------------------------------------------------------------------
+
+def read_image_sequence(directory: str):
+    """Yield ``(name, image)`` for the frames in *directory*, in natural
+    order (``frame2`` before ``frame10``)."""
+    def natural(name):
+        return [int(t) if t.isdigit() else t
+                for t in re.split(r"(\d+)", name.lower())]
+
+    names = sorted((n for n in os.listdir(directory)
+                    if n.lower().endswith(_FRAME_EXTS)), key=natural)
+    for name in names:
+        with Image.open(os.path.join(directory, name)) as img:
+            img.load()
+            yield os.path.splitext(name)[0], img
+
+
+def read_video_ffmpeg(path: str, fps: float = None):
+    """Yield ``(name, image)`` for every frame of a video decoded by the
+    ``ffmpeg`` command-line tool (optionally resampled to *fps*).
+
+    ``RuntimeError`` (with ffmpeg's message) is raised after the last
+    frame if ffmpeg failed, so a decode error cannot pass for the end of
+    the clip.
+    """
+    probe = subprocess.run(
+        ["ffprobe", "-v", "error", "-select_streams", "v:0",
+         "-show_entries",
+         "stream=width,height:stream_tags=rotate:stream_side_data=rotation",
+         "-of", "json", path],
+        capture_output=True, check=True, text=True,
+    )
+    stream = json.loads(probe.stdout)["streams"][0]
+    w, h = int(stream["width"]), int(stream["height"])
+    # ffmpeg auto-rotates, so quarter-turned clips (portrait phone video)
+    # arrive with width and height swapped relative to the coded size
+    if _rotation(stream) % 180 == 90:
+        w, h = h, w
+
+    cmd = ["ffmpeg", "-v", "error", "-i", path]
+    if fps:
+        cmd += ["-vf", f"fps={fps}"]
+    cmd += ["-f", "rawvideo", "-pix_fmt", "rgb24", "-"]
+    frame_bytes = w * h * 3
+    # A file, not a pipe: unread errors could fill a pipe and stall ffmpeg
+    with tempfile.TemporaryFile() as errors:
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=errors)
+        try:
+            index = 0
+            while True:
+                data = proc.stdout.read(frame_bytes)
+                if len(data) < frame_bytes:
+                    break
+                yield f"frame_{index:06d}", Image.frombytes(
+                    "RGB", (w, h), data)
+                index += 1
+        finally:
+            proc.stdout.close()
+            proc.wait()
+        if proc.returncode != 0:
+            errors.seek(0)
+            message = errors.read().decode(errors="replace").strip()
+            raise RuntimeError(f"ffmpeg failed on {path} after {index} "
+                               f"frames (exit {proc.returncode}): {message}")
+
+
+def _rotation(stream: dict) -> int:
+    """Display rotation of an ffprobe stream entry in degrees, 0-359."""
+    for side_data in stream.get("side_data_list", ()):
+        if "rotation" in side_data:
+            return int(round(float(side_data["rotation"]))) % 360
+    try:
+        return int(stream.get("tags", {}).get("rotate", 0)) % 360
+    except ValueError:
+        return 0
+
+
+# ---------------------------------------------------------------------------
+# Temporal mask reuse
+# ---------------------------------------------------------------------------
+
+def _signature(frame: Image.Image) -> np.ndarray:
+    """Small grayscale float copy of *frame* for cheap comparisons."""
+    small = frame.convert("L") if frame.mode != "L" else frame
+    factor = min(small.size) // (SIGNATURE_SIZE * 2)
+    if factor > 1:
+        small = small.reduce(factor)
+    small = small.resize((SIGNATURE_SIZE, SIGNATURE_SIZE), Image.BILINEAR)
+    return np.asarray(small, dtype=np.float32)
+
+
+def _translation(ref: np.ndarray, cur: np.ndarray) -> tuple:
+    """Sub-pixel ``(dy, dx)`` such that *cur* ≈ *ref* shifted by it
+    (phase correlation with a parabolic fit around the peak)."""
+    # A Hann window stops the frame borders from dominating the peak
+    window = np.outer(np.hanning(ref.shape[0]), np.hanning(ref.shape[1]))
+    spectrum = np.fft.fft2((cur - cur.mean()) * window) * np.conj(
+        np.fft.fft2((ref - ref.mean()) * window))
+    spectrum /= np.abs(spectrum) + 1e-9
+    corr = np.fft.ifft2(spectrum).real
+    h, w = corr.shape
+    py, px = np.unravel_index(int(np.argmax(corr)), corr.shape)
+
+    def refine(before, peak, after):
+        curvature = before - 2.0 * peak + after
+        return 0.5 * (before - after) / curvature if curvature < 0 else 0.0
+
+    dy = py + refine(corr[(py - 1) % h, px], corr[py, px],
+                     corr[(py + 1) % h, px])
+    dx = px + refine(corr[py, (px - 1) % w], corr[py, px],
+                     corr[py, (px + 1) % w])
+    return (dy - h if dy > h / 2 else dy), (dx - w if dx > w / 2 else dx)
+
+
+def _shift(array: np.ndarray, dy: float, dx: float) -> np.ndarray:
+    """Translate a 2-D array by a possibly fractional offset (bilinear),
+    replicating its edges into the gap."""
+    iy, ix = int(np.floor(dy)), int(np.floor(dx))
+    fy, fx = dy - iy, dx - ix
+    out = None
+    for oy, wy in ((iy, 1.0 - fy), (iy + 1, fy)):
+        for ox, wx in ((ix, 1.0 - fx), (ix + 1, fx)):
+            weight = wy * wx
+            if weight < 1e-3:
+                continue
+            part = _shift_int(array, oy, ox) * weight
+            out = part if out is None else out + part
+    return out.astype(np.float32, copy=False)
+
+
+def _shift_int(array: np.ndarray, dy: int, dx: int) -> np.ndarray:
+    if not dy and not dx:
+        return array
+    h, w = array.shape
+    dy = max(-h + 1, min(h - 1, dy))
+    dx = max(-w + 1, min(w - 1, dx))
+    padded = np.pad(array, ((abs(dy), abs(dy)), (abs(dx), abs(dx))),
+                    mode="edge")
+    y0 = abs(dy) - dy
+    x0 = abs(dx) - dx
+    return padded[y0:y0 + h, x0:x0 + w]
+
+
+class SequenceProcessor:
+    """Turns frames into masks, running the model only when needed.
+
+    *threshold* is the mean absolute difference (0-255 grey levels) of
+    the aligned signatures below which the keyframe mask is reused;
+    *max_reuse* forces a fresh inference after that many reused frames.
+    *smoothing* is the weight of the previous mask in the moving average
+    (0 disables it); a difference above *cut_threshold* is treated as a
+    scene cut and resets both reuse and smoothing.
+    """
+
+    def __init__(self, model=None, threshold: float = 2.0,
+                 max_reuse: int = 12, smoothing: float = 0.6,
+                 cut_threshold: float = 30.0, warp: bool = True):
+        self.spec = resolve_model(model)
+        self.threshold = threshold
+        self.max_reuse = max_reuse
+        self.smoothing = smoothing
+        self.cut_threshold = cut_threshold
+        self.warp = warp
+        self.frames = 0
+        self.inferred = 0
+        self._key_signature = None
+        self._key_mask = None
+        self._reused = 0
+        self._smoothed = None
+
+    def mask(self, frame: Image.Image) -> np.ndarray:
+        """Raw model-resolution mask for the next frame."""
+        self.frames += 1
+        signature = _signature(frame)
+        mask = None
+        cut = True
+
+        if self._key_signature is not None:
+            dy = dx = 0.0
+            diff = float(np.abs(self._key_signature - signature).mean())
+            if self.warp and diff > self.threshold:
+                # Keep the shift only if it explains the change better; a
+                # moving subject on a still background can pull it off
+                ty, tx = _translation(self._key_signature, signature)
+                aligned = _shift(self._key_signature, ty, tx)
+                warped_diff = float(np.abs(aligned - signature).mean())
+                if warped_diff < diff:
+                    dy, dx, diff = ty, tx, warped_diff
+            cut = diff > self.cut_threshold
+            if diff <= self.threshold and self._reused < self.max_reuse:
+                h, w = self._key_mask.shape
+                mask = _shift(self._key_mask, dy * h / SIGNATURE_SIZE,
+                              dx * w / SIGNATURE_SIZE)
+                self._reused += 1
+
+        if mask is None:
+            mask = np.squeeze(
+                predict_mask(frame, model=self.spec)).astype(np.float32)
+            self.inferred += 1
+            self._key_signature = signature
+            self._key_mask = mask
+            self._reused = 0
+
+        if self.smoothing and self._smoothed is not None and not cut:
+            mask = self.smoothing * self._smoothed + \
+                (1.0 - self.smoothing) * mask
+        self._smoothed = mask
+        return mask
+
+    def process(self, frame: Image.Image, mask_only: bool = False):
+        """Full-resolution cutout (or ``L`` mask) for the next frame."""
+        alpha = mask_to_alpha(self.mask(frame), frame.size)
+        return alpha if mask_only else apply_alpha(frame, alpha)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            "frames": self.frames,
+            "inferred": self.inferred,
+            "reused": self.frames - self.inferred,
+            "inference_ratio": (self.inferred / self.frames
+                                if self.frames else 0.0),
+        }
+
+
+def process_sequence(frames, out_dir: str, model=None,
+                     mask_only: bool = False, **options) -> dict:
+    """Write one PNG per ``(name, image)`` of *frames* into *out_dir*.
+
+    *options* go to ``SequenceProcessor``.  Returns its stats plus timing.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    processor = SequenceProcessor(model, **options)
+    start = time.perf_counter()
+    for name, frame in frames:
+        processor.process(frame, mask_only).save(
+            os.path.join(out_dir, name + ".png"))
+    elapsed = time.perf_counter() - start
+    stats = processor.stats
+    stats["seconds"] = elapsed
+    stats["fps"] = stats["frames"] / elapsed if elapsed > 0 else 0.0
+    return stats
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("source", help="folder of frames or a video file")
+    parser.add_argument("out_dir")
+    parser.add_argument("-m", "--model", default=MODEL_NAME,
+                        choices=sorted(MODELS))
+    parser.add_argument("--mask-only", action="store_true",
+                        help="write grayscale masks instead of cutouts")
+    parser.add_argument("--threshold", type=float, default=2.0,
+                        help="max mean signature difference for mask reuse")
+    parser.add_argument("--max-reuse", type=int, default=12,
+                        help="frames in a row that may reuse one mask")
+    parser.add_argument("--smoothing", type=float, default=0.6,
+                        help="weight of the previous mask (0 = off)")
+    parser.add_argument("--no-warp", action="store_true",
+                        help="reuse masks without motion compensation")
+    parser.add_argument("--fps", type=float, default=None,
+                        help="resample video to this frame rate")
+    args = parser.parse_args(argv)
+
+    if os.path.isdir(args.source):
+        frames = read_image_sequence(args.source)
+    else:
+        frames = read_video_ffmpeg(args.source, args.fps)
+
+    stats = process_sequence(
+        frames, args.out_dir, args.model, args.mask_only,
+        threshold=args.threshold, max_reuse=args.max_reuse,
+        smoothing=args.smoothing, warp=not args.no_warp,
+    )
+    print(f"[BG Remover] {stats['frames']} frames, {stats['inferred']} "
+          f"inferences ({stats['inference_ratio']:.0%}) in "
+          f"{stats['seconds']:.1f}s ({stats['fps']:.1f} fps)")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,506 @@
+"""
+Local HTTP background-removal service with dynamic batching.
+
+Concurrent uploads are gathered into one ``session.run`` of up to
+``--max-batch`` images: the first request waiting opens a batch, which
+closes when it is full or ``--batch-window-ms`` later.  Decoding, mask
+resizing and encoding run on a thread pool; inference runs on the model's
+session pool (see ``bg_remover.configure_pool``), from one thread per
+session slot, always padded to ``--max-batch`` rows so each thread keeps
+a single input buffer.
+
+Requests beyond ``--queue-size`` in flight are refused at once with
+``503`` and ``Retry-After`` instead of queueing without bound; their
+bodies are read and dropped, never buffered.
+
+Endpoints:
+
+    POST /remove[?format=FORMAT]          body: the image (raw bytes or a
+                                          multipart/form-data file field)
+    GET  /metrics                         JSON counters and latencies
+    GET  /healthz                         200 once the model is loaded
+
+FORMAT is ``png``, ``png:LEVEL`` (zlib level 0-9), ``webp`` (lossless),
+``webp:QUALITY`` (lossy colour, exact alpha) or ``mask`` (grayscale
+alpha); the default is set with ``--format``.
+
+Uses only the standard library on top of bg_remover's dependencies:
+
+    python server.py [--host 127.0.0.1] [--port 8080] [--model u2net]
+                     [--max-batch 8] [--batch-window-ms 10]
+                     [--queue-size 64] [--threads N] [--format png]
+"""
+
+import argparse
+import asyncio
+import collections
+import io
+import json
+import os
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import parse_qs, urlsplit
+
+import bg_remover
+from bg_remover import OutputFormat, predict_masks, prepare_model_input, \
+    render_result, resolve_model, supports_batching
+
+MAX_BODY_BYTES = 64 * 1024 * 1024
+
+# Unread request bodies are drained in chunks of this size; one refused
+# without its length known is drained for at most _LINGER_SECONDS
+_DRAIN_CHUNK = 64 * 1024
+_LINGER_SECONDS = 5.0
+
+_REASONS = {
+    200: "OK", 400: "Bad Request", 404: "Not Found",
+    405: "Method Not Allowed", 411: "Length Required",
+    413: "Payload Too Large", 500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(message or _REASONS.get(status, ""))
+        self.status = status
+
+
+# ---------------------------------------------------------------------------
+# Metrics
+# ---------------------------------------------------------------------------
+
+class Metrics:
+    """Counters plus latency samples over the last *window* requests."""
+
+    def __init__(self, window: int = 1000):
+        self.started = time.time()
+        self.requests = 0
+        self.responses = collections.Counter()
+        self.rejected = 0
+        self.in_flight = 0
+        self.batches = 0
+        self.batched_images = 0
+        self._latency = collections.deque(maxlen=window)
+        self._inference = collections.deque(maxlen=window)
+        self._batch_sizes = collections.Counter()
+        self._done_at = collections.deque(maxlen=window)
+
+    def record_request(self, status: int, seconds: float):
+        self.responses[status] += 1
+        if status == 200:
+            self._latency.append(seconds * 1000.0)
+            self._done_at.append(time.monotonic())
+
+    def record_batch(self, size: int, seconds: float):
+        self.batches += 1
+        self.batched_images += size
+        self._batch_sizes[size] += 1
+        self._inference.append(seconds * 1000.0)
+
+    def snapshot(self, queue_depth: int) -> dict:
+        now = time.monotonic()
+        recent = [t for t in self._done_at if now - t <= 60.0]
+        span = now - recent[0] if len(recent) > 1 else 0.0
+        return {
+            "uptime_s": round(time.time() - self.started, 1),
+            "requests": self.requests,
+            "responses": {str(k): v for k, v in sorted(self.responses.items())},
+            "rejected": self.rejected,
+            "in_flight": self.in_flight,
+            "queue_depth": queue_depth,
+            "batches": self.batches,
+            "mean_batch_size": (self.batched_images / self.batches
+                                if self.batches else 0.0),
+            "batch_sizes": {str(k): v for k, v in
+                            sorted(self._batch_sizes.items())},
+            "throughput_rps": (len(recent) - 1) / span if span else 0.0,
+            "latency_ms": _percentiles(self._latency),
+            "inference_ms": _percentiles(self._inference),
+        }
+
+
+def _percentiles(samples) -> dict:
+    if not samples:
+        return {}
+    data = sorted(samples)
+
+    def pick(q):
+        return round(data[min(len(data) - 1, int(q * len(data)))], 2)
+
+    return {"p50": pick(0.50), "p90": pick(0.90), "p99": pick(0.99),
+            "max": round(data[-1], 2)}
+
+
+# ---------------------------------------------------------------------------
+# Dynamic batcher
+# ---------------------------------------------------------------------------
+
+class Batcher:
+    """Groups concurrent mask requests into batched model runs."""
+
+    def __init__(self, model=None, max_batch: int = 8,
+                 window_ms: float = 10.0, metrics: Metrics = None):
+        self.spec = resolve_model(model)
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000.0
+        self.metrics = metrics or Metrics()
+        self._queue = asyncio.Queue()
+        self._pool = bg_remover.get_pool(self.spec)
+        # One batch in flight per session slot, each on its own thread
+        slots = self._pool.size * self._pool.runs_per_session
+        self._slots = asyncio.Semaphore(slots)
+        self._executor = ThreadPoolExecutor(
+            slots, thread_name_prefix="bg_remover_infer")
+        self._tasks = set()
+        self._runner = None
+
+    @property
+    def depth(self) -> int:
+        return self._queue.qsize()
+
+    def start(self):
+        self._runner = asyncio.ensure_future(self._run())
+
+    async def stop(self):
+        if self._runner:
+            self._runner.cancel()
+        for task in list(self._tasks):
+            task.cancel()
+        self._executor.shutdown(wait=False)
+
+    async def predict(self, small):
+        """Model-resolution mask for a downscaled image."""
+        future = asyncio.get_running_loop().create_future()
+        self._queue.put_nowait((small, future))
+        return await future
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        if not supports_batching(self.spec):
+            self.max_batch = 1
+        while True:
+            batch = [await self._queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(
+                        await asyncio.wait_for(self._queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+            batch = [(s, f) for s, f in batch if not f.cancelled()]
+            if not batch:
+                continue
+            await self._slots.acquire()
+            task = asyncio.ensure_future(self._infer(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _infer(self, batch: list):
+        loop = asyncio.get_running_loop()
+        try:
+            start = time.perf_counter()
+            masks = await loop.run_in_executor(
+                self._executor, self._run_batch,
+                [small for small, _f in batch])
+            self.metrics.record_batch(len(batch), time.perf_counter() - start)
+            for (_small, future), mask in zip(batch, masks):
+                if not future.done():
+                    future.set_result(mask)
+        except Exception as e:
+            for _small, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+        finally:
+            self._slots.release()
+
+    def _run_batch(self, smalls: list) -> list:
+        # Padded to one shape: a buffer per batch size would be kept by
+        # every thread for good
+        return predict_masks(smalls, self.spec, self.max_batch)
+
+
+# ---------------------------------------------------------------------------
+# Request handling
+# ---------------------------------------------------------------------------
+
+def _decode(data: bytes, spec, keep: bool) -> tuple:
+    """``(model input image, full size, image)`` from a reduced-resolution
+    decode; the full image is only decoded by ``_encode`` if it is needed.
+
+    Formats other than JPEG have no reduced decode: with *keep* their one
+    full decode is returned as *image* for ``_encode`` (else None).
+    """
+    try:
+        return prepare_model_input(io.BytesIO(data), spec, keep)
+    except Exception as e:
+        raise HTTPError(400, f"cannot decode image: {e}") from None
+
+
+def _encode(data: bytes, mask, size: tuple, fmt: OutputFormat,
+            image=None) -> bytes:
+    return fmt.encode(render_result(io.BytesIO(data), mask, size, fmt,
+                                    image))
+
+
+def _upload_body(headers: dict, body: bytes) -> bytes:
+    """The image bytes of a raw or multipart/form-data upload."""
+    ctype = headers.get("content-type", "")
+    if not ctype.lower().startswith("multipart/form-data"):
+        return body
+    from email.parser import BytesParser
+    from email.policy import HTTP
+    msg = BytesParser(policy=HTTP).parsebytes(
+        f"Content-Type: {ctype}\r\n\r\n".encode("latin-1") + body)
+    for part in msg.iter_parts():
+        if part.get_filename() or part.get_param(
+                "name", header="content-disposition") in ("file", "image"):
+            return part.get_payload(decode=True)
+    raise HTTPError(400, "no file field in multipart upload")
+
+
+def _content_length(headers: dict) -> int:
+    if "content-length" not in headers:
+        raise HTTPError(411)
+    try:
+        length = int(headers["content-length"])
+    except ValueError:
+        length = -1
+    if length < 0:
+        raise HTTPError(400, "bad Content-Length")
+    if length > MAX_BODY_BYTES:
+        raise HTTPError(413)
+    return length
+
+
+async def _discard(reader, length: int):
+    """Read and drop *length* body bytes without holding them."""
+    while length > 0:
+        chunk = await reader.read(min(length, _DRAIN_CHUNK))
+        if not chunk:
+            raise asyncio.IncompleteReadError(b"", length)
+        length -= len(chunk)
+
+
+async def _linger(reader, writer):
+    """Half-close, then drain what the client is still sending.
+
+    Closing a socket with unread data resets the connection, and the
+    client loses the response it has not read yet.
+    """
+    if writer.can_write_eof():
+        writer.write_eof()
+
+    async def drain():
+        while await reader.read(_DRAIN_CHUNK):
+            pass
+
+    try:
+        await asyncio.wait_for(drain(), _LINGER_SECONDS)
+    except asyncio.TimeoutError:
+        pass
+
+
+class Server:
+    """asyncio HTTP/1.1 front end over a ``Batcher``."""
+
+    def __init__(self, model=None, max_batch: int = 8,
+                 window_ms: float = 10.0, queue_size: int = 64,
+                 threads: int = None, output_format=None):
+        self.spec = resolve_model(model)
+        if isinstance(output_format, str):
+            output_format = OutputFormat.parse(output_format)
+        self.output_format = output_format or bg_remover.get_output_format()
+        self.queue_size = max(1, queue_size)
+        self.metrics = Metrics()
+        self.threads = threads or min(32, (os.cpu_count() or 1) + 4)
+        self._max_batch = max_batch
+        self._window_ms = window_ms
+        self.batcher = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 8080):
+        loop = asyncio.get_running_loop()
+        loop.set_default_executor(ThreadPoolExecutor(self.threads))
+        await loop.run_in_executor(None, bg_remover.preload, self.spec)
+        self.batcher = Batcher(self.spec, self._max_batch, self._window_ms,
+                               self.metrics)
+        self.batcher.start()
+        return await asyncio.start_server(self._handle, host, port)
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                keep_alive = await self._handle_one(reader, writer)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _handle_one(self, reader, writer) -> bool:
+        line = await reader.readline()
+        if not line:
+            return False
+        try:
+            method, target, version = line.decode("latin-1").split()
+        except ValueError:
+            await self._respond(writer, 400, b"bad request line", close=True)
+            return False
+
+        headers = {}
+        while True:
+            raw = await reader.readline()
+            if raw in (b"\r\n", b"\n", b""):
+                break
+            name, _, value = raw.decode("latin-1").partition(":")
+            headers[name.strip().lower()] = value.strip()
+        keep_alive = headers.get("connection", "").lower() != "close" \
+            and version == "HTTP/1.1"
+
+        url = urlsplit(target)
+        if url.path == "/remove":
+            if method != "POST":
+                has_body = "content-length" in headers \
+                    or "transfer-encoding" in headers
+                await self._respond(writer, 405, b"use POST", close=has_body)
+                if has_body:
+                    await _linger(reader, writer)
+                    return False
+                return keep_alive
+            return await self._remove(reader, writer, headers, url,
+                                      keep_alive)
+        if method == "GET" and url.path == "/metrics":
+            body = json.dumps(
+                self.metrics.snapshot(self.batcher.depth), indent=1).encode()
+            await self._respond(writer, 200, body, "application/json")
+        elif method == "GET" and url.path == "/healthz":
+            ready = bg_remover.is_ready(self.spec)
+            await self._respond(writer, 200 if ready else 503,
+                                b"ok" if ready else b"loading")
+        else:
+            await self._respond(writer, 404, b"not found")
+        return keep_alive
+
+    async def _remove(self, reader, writer, headers, url, keep_alive) -> bool:
+        metrics = self.metrics
+        metrics.requests += 1
+        start = time.perf_counter()
+
+        try:
+            length = _content_length(headers)
+        except HTTPError as e:
+            # The body cannot be skipped by its length
+            metrics.record_request(e.status, 0.0)
+            await self._respond(writer, e.status, str(e).encode(),
+                                close=True)
+            await _linger(reader, writer)
+            return False
+
+        # Backpressure: refuse without buffering the body.  It is still
+        # read and dropped, or the client would get a reset, not the 503.
+        if metrics.in_flight >= self.queue_size:
+            metrics.rejected += 1
+            metrics.record_request(503, 0.0)
+            await _discard(reader, length)
+            await self._respond(writer, 503, b"busy, retry later",
+                                extra={"Retry-After": "1"}, close=True)
+            return False
+
+        metrics.in_flight += 1
+        status = 500
+        try:
+            body = await reader.readexactly(length)
+            data = _upload_body(headers, body)
+            fmt = self.output_format
+            query = parse_qs(url.query).get("format")
+            if query:
+                try:
+                    fmt = OutputFormat.parse(query[0])
+                except ValueError as e:
+                    raise HTTPError(400, str(e)) from None
+
+            loop = asyncio.get_running_loop()
+            small, size, image = await loop.run_in_executor(
+                None, _decode, data, self.spec, fmt.kind != "mask")
+            mask = await self.batcher.predict(small)
+            out = await loop.run_in_executor(
+                None, _encode, data, mask, size, fmt, image)
+            status = 200
+            await self._respond(writer, 200, out, fmt.mime_type,
+                                close=not keep_alive)
+        except HTTPError as e:
+            status = e.status
+            await self._respond(writer, e.status, str(e).encode(),
+                                close=not keep_alive)
+        except Exception as e:
+            print(f"[BG Remover] Request failed: {e}")
+            await self._respond(writer, 500, str(e).encode(), close=True)
+            keep_alive = False
+        finally:
+            metrics.in_flight -= 1
+            metrics.record_request(status, time.perf_counter() - start)
+        return keep_alive
+
+    async def _respond(self, writer, status: int, body: bytes,
+                       content_type: str = "text/plain", extra: dict = None,
+                       close: bool = False):
+        head = [
+            f"HTTP/1.1 {status} {_REASONS.get(status, '')}",
+            f"Content-Type: {content_type}",
+            f"Content-Length: {len(body)}",
+        ]
+        head += [f"{k}: {v}" for k, v in (extra or {}).items()]
+        if close:
+            head.append("Connection: close")
+        writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1") + body)
+        await writer.drain()
+
+
+async def serve(host="127.0.0.1", port=8080, **kwargs):
+    server = Server(**kwargs)
+    tcp = await server.start(host, port)
+    print(f"[BG Remover] Serving {server.spec.name} on http://{host}:{port} "
+          f"(batch <= {server._max_batch}, window {server._window_ms} ms, "
+          f"queue {server.queue_size})")
+    async with tcp:
+        await tcp.serve_forever()
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Background removal server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8080)
+    parser.add_argument("-m", "--model", default=bg_remover.MODEL_NAME,
+                        choices=sorted(bg_remover.MODELS))
+    parser.add_argument("--max-batch", type=int, default=8,
+                        help="images per model run (default 8)")
+    parser.add_argument("--batch-window-ms", type=float, default=10.0,
+                        help="how long a batch waits to fill (default 10)")
+    parser.add_argument("--queue-size", type=int, default=64,
+                        help="requests in flight before refusing with 503")
+    parser.add_argument("--threads", type=int, default=None,
+                        help="decode/encode threads")
+    parser.add_argument("--format", default="png", type=OutputFormat.parse,
+                        help="default output format: png[:LEVEL], webp, "
+                             "webp:QUALITY or mask (default: png)")
+    args = parser.parse_args(argv)
+
+    try:
+        asyncio.run(serve(
+            args.host, args.port, model=args.model,
+            max_batch=args.max_batch, window_ms=args.batch_window_ms,
+            queue_size=args.queue_size, threads=args.threads,
+            output_format=args.format,
+        ))
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+"""
+ONNX Runtime session options for bg_remover.
+
+``SessionConfig`` collects the threading, execution-mode and memory
+settings applied to every new session, on desktop (onnxruntime) and on
+Android (Java ORT via pyjnius) alike.  A profile chosen by
+``tune_session.py`` is saved as JSON and picked up by ``bg_remover`` the
+next time a session is created.
+
+Kept free of Kivy/numpy imports so the offline tools can use it too.
+"""
+
+import json
+import os
+
+from model_registry import MODEL_DIR
+
+# Written by tune_session.py, read by bg_remover.get_session_config()
+PROFILE_PATH = os.environ.get(
+    "BG_REMOVER_SESSION_PROFILE",
+    os.path.join(MODEL_DIR, "session_profile.json"),
+)
+
+EXECUTION_MODES = ("sequential", "parallel")
+
+
+class SessionConfig:
+    """Options applied to new ONNX Runtime sessions.
+
+    Thread counts of 0 leave the choice to ONNX Runtime (one intra-op
+    thread per physical core).  ``inter_op_threads`` only matters in
+    ``"parallel"`` execution mode.  Spinning keeps idle pool threads busy
+    waiting for work: lower latency for one process, wasted cores when
+    several workers share a machine.
+    """
+
+    _FIELDS = ("intra_op_threads", "inter_op_threads", "execution_mode",
+               "cpu_mem_arena", "mem_pattern", "allow_spinning")
+
+    def __init__(self, intra_op_threads: int = 0, inter_op_threads: int = 0,
+                 execution_mode: str = "sequential",
+                 cpu_mem_arena: bool = True, mem_pattern: bool = True,
+                 allow_spinning: bool = True):
+        if execution_mode not in EXECUTION_MODES:
+            raise ValueError(
+                f"execution_mode must be one of {EXECUTION_MODES}, "
+                f"got {execution_mode!r}"
+            )
+        self.intra_op_threads = int(intra_op_threads)
+        self.inter_op_threads = int(inter_op_threads)
+        self.execution_mode = execution_mode
+        self.cpu_mem_arena = bool(cpu_mem_arena)
+        self.mem_pattern = bool(mem_pattern)
+        self.allow_spinning = bool(allow_spinning)
+
+    def replace(self, **changes) -> "SessionConfig":
+        """Copy with some fields changed."""
+        return SessionConfig(**dict(self.to_dict(), **changes))
+
+    def to_dict(self) -> dict:
+        return {name: getattr(self, name) for name in self._FIELDS}
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "SessionConfig":
+        return cls(**{k: v for k, v in data.items() if k in cls._FIELDS})
+
+    # -- applying -----------------------------------------------------------
+
+    def apply_desktop(self, opts):
+        """Set these options on an ``onnxruntime.SessionOptions``."""
+        import onnxruntime as ort
+
+        opts.intra_op_num_threads = self.intra_op_threads
+        opts.inter_op_num_threads = self.inter_op_threads
+        opts.execution_mode = (
+            ort.ExecutionMode.ORT_PARALLEL
+            if self.execution_mode == "parallel"
+            else ort.ExecutionMode.ORT_SEQUENTIAL
+        )
+        opts.enable_cpu_mem_arena = self.cpu_mem_arena
+        opts.enable_mem_pattern = self.mem_pattern
+        spin = "1" if self.allow_spinning else "0"
+        opts.add_session_config_entry("session.intra_op.allow_spinning", spin)
+        opts.add_session_config_entry("session.inter_op.allow_spinning", spin)
+        return opts
+
+    def apply_android(self, opts):
+        """Set these options on a Java ``OrtSession.SessionOptions``."""
+        from jnius import autoclass
+
+        ExecutionMode = autoclass(
+            "ai.onnxruntime.OrtSession$SessionOptions$ExecutionMode")
+
+        if self.intra_op_threads:
+            opts.setIntraOpNumThreads(self.intra_op_threads)
+        if self.inter_op_threads:
+            opts.setInterOpNumThreads(self.inter_op_threads)
+        opts.setExecutionMode(
+            ExecutionMode.PARALLEL if self.execution_mode == "parallel"
+            else ExecutionMode.SEQUENTIAL
+        )
+        opts.setCPUArenaAllocator(self.cpu_mem_arena)
+        opts.setMemoryPatternOptimization(self.mem_pattern)
+        spin = "1" if self.allow_spinning else "0"
+        opts.addConfigEntry("session.intra_op.allow_spinning", spin)
+        opts.addConfigEntry("session.inter_op.allow_spinning", spin)
+        return opts
+
+    def __eq__(self, other):
+        return isinstance(other, SessionConfig) and \
+            self.to_dict() == other.to_dict()
+
+    def __repr__(self):
+        args = ", ".join(f"{k}={v!r}" for k, v in self.to_dict().items())
+        return f"SessionConfig({args})"
+
+
+def default_config(platform: str) -> SessionConfig:
+    """Built-in defaults when no profile has been saved."""
+    if platform == "android":
+        # Phones: two big cores for the convolutions, no spinning to save
+        # battery while the UI thread is idle
+        return SessionConfig(intra_op_threads=2, inter_op_threads=1,
+                             allow_spinning=False)
+    return SessionConfig()
+
+
+# ---------------------------------------------------------------------------
+# Saved profiles
+# ---------------------------------------------------------------------------
+
+def host_id() -> str:
+    """Identifies the machine a profile was tuned on."""
+    import platform as host
+    return f"{host.machine()}|{os.cpu_count()}"
+
+
+def save_profile(config: SessionConfig, path: str = PROFILE_PATH,
+                 **info) -> str:
+    """Write *config* (plus free-form *info*, e.g. benchmark results)."""
+    data = {"host": host_id(), "config": config.to_dict()}
+    data.update(info)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp, path)
+    return path
+
+
+def load_profile(path: str = PROFILE_PATH):
+    """The saved ``SessionConfig``, or None if there is none for this host."""
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get("host") != host_id():
+        print(f"[BG Remover] Ignoring session profile tuned on another "
+              f"machine: {path}")
+        return None
+    try:
+        return SessionConfig.from_dict(data.get("config", {}))
+    except (TypeError, ValueError) as e:
+        print(f"[BG Remover] Ignoring invalid session profile ({e}): {path}")
+        return None
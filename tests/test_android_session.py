@@ -0,0 +1,334 @@
+"""
+_AndroidOnnxSession against a stand-in ``jnius``.
+
+The stand-in maps the few Java ONNX Runtime classes the wrapper uses onto
+the Python ``onnxruntime`` package, enforces the Java ``OrtSession.run``
+argument rules (requested and pinned outputs are disjoint and together
+no more than the model's outputs), and counts native allocations,
+tensor creations and byte copies.
+
+Needs ``onnx`` (to build the stand-in models) and ``onnxruntime``.
+"""
+
+import os
+import sys
+import types
+
+import numpy as np
+import pytest
+
+onnx = pytest.importorskip("onnx")
+ort = pytest.importorskip("onnxruntime")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bg_remover  # noqa: E402
+
+SIZE = 32
+
+
+# ---------------------------------------------------------------------------
+# Stand-in jnius
+# ---------------------------------------------------------------------------
+
+class Stats(dict):
+    def __init__(self):
+        super().__init__(alloc=0, tensor=0, copy=0)
+
+
+STATS = Stats()
+
+
+class _ByteBuffer:
+    def __init__(self, nbytes: int):
+        self.data = bytearray(nbytes)
+
+    @staticmethod
+    def allocateDirect(nbytes):
+        STATS["alloc"] += 1
+        return _ByteBuffer(nbytes)
+
+    def order(self, _order):
+        return self
+
+    def asFloatBuffer(self):
+        return _FloatBuffer(self)
+
+    def clear(self):
+        return self
+
+    def put(self, data, pass_by_reference=True):
+        STATS["copy"] += 1
+        self.data[:len(data)] = data
+        return self
+
+    def array(self):
+        STATS["copy"] += 1
+        return bytes(self.data)
+
+
+class _FloatBuffer:
+    def __init__(self, buffer):
+        self.buffer = buffer
+
+
+class _OnnxTensor:
+    def __init__(self, buffer, shape, uint8=False):
+        self.buffer = buffer
+        self.shape = list(shape)
+        self.uint8 = uint8
+        self.closed = False
+
+    @staticmethod
+    def createTensor(_env, buffer, shape, java_type=None):
+        STATS["tensor"] += 1
+        if isinstance(buffer, _FloatBuffer):
+            return _OnnxTensor(buffer.buffer, shape)
+        return _OnnxTensor(buffer, shape, uint8=True)
+
+    def getInfo(self):
+        return self
+
+    def getShape(self):
+        return self.shape
+
+    def getByteBuffer(self):
+        # Java returns a copy of the tensor's contents
+        STATS["copy"] += 1
+        copy = _ByteBuffer(0)
+        copy.data = bytearray(self.buffer.data)
+        return copy
+
+    def close(self):
+        self.closed = True
+
+
+class _Optional:
+    def __init__(self, value):
+        self._value = value
+
+    def get(self):
+        return self._value
+
+
+class _Result(dict):
+    def get(self, name):
+        return _Optional(dict.get(self, name))
+
+    def close(self):
+        pass
+
+
+class _NodeInfo:
+    def __init__(self, shape, elem_type="tensor(float)"):
+        self.shape = [d if isinstance(d, int) else -1 for d in shape]
+        kind = "UINT8" if elem_type == "tensor(uint8)" else "FLOAT"
+        self.type = types.SimpleNamespace(name=lambda: kind)
+
+    def getInfo(self):
+        return self
+
+    def getShape(self):
+        return self.shape
+
+
+class _Session:
+    def __init__(self, path):
+        self._session = ort.InferenceSession(
+            path, providers=["CPUExecutionProvider"])
+        self._outputs = [o.name for o in self._session.get_outputs()]
+
+    def getInputNames(self):
+        return [i.name for i in self._session.get_inputs()]
+
+    def getOutputNames(self):
+        return list(self._outputs)
+
+    def getInputInfo(self):
+        return {i.name: _NodeInfo(i.shape, i.type)
+                for i in self._session.get_inputs()}
+
+    def getOutputInfo(self):
+        return {o.name: _NodeInfo(o.shape)
+                for o in self._session.get_outputs()}
+
+    def run(self, inputs, requested, pinned=None):
+        requested = list(requested)
+        pinned = dict(pinned or {})
+        # The checks Java's OrtSession.run makes before running
+        if len(requested) + len(pinned) > len(self._outputs):
+            raise RuntimeError("Unexpected number of outputs")
+        both = set(requested) & set(pinned)
+        if both:
+            raise RuntimeError(f"Output '{both.pop()}' was found in both "
+                               f"the requested outputs and the pinned "
+                               f"outputs")
+        if not requested and not pinned:
+            raise RuntimeError("At least one output must be requested")
+
+        feed = {
+            name: np.frombuffer(t.buffer.data,
+                                np.uint8 if t.uint8 else np.float32
+                                ).reshape(t.shape)
+            for name, t in inputs.items()
+        }
+        names = requested + list(pinned)
+        values = self._session.run(names, feed)
+        result = _Result()
+        for name, value in zip(names, values):
+            if name in pinned:
+                tensor = pinned[name]
+                tensor.buffer.data[:] = value.tobytes()
+            else:
+                buffer = _ByteBuffer(value.nbytes)
+                buffer.data[:] = value.tobytes()
+                tensor = _OnnxTensor(buffer, value.shape)
+            result[name] = tensor
+        return result
+
+    def close(self):
+        pass
+
+
+class _Environment:
+    def getVersion(self):
+        return "stub"
+
+    def createSession(self, path, _opts):
+        return _Session(path)
+
+
+class _SessionOptions:
+    def __getattr__(self, name):
+        # setIntraOpNumThreads, setExecutionMode, addConfigEntry, ...
+        return lambda *args: None
+
+
+class _HashSet(list):
+    def add(self, value):
+        self.append(value)
+
+
+class _HashMap(dict):
+    def put(self, key, value):
+        self[key] = value
+
+
+_CLASSES = {
+    "ai.onnxruntime.OnnxTensor": _OnnxTensor,
+    "ai.onnxruntime.OnnxJavaType": types.SimpleNamespace(UINT8="UINT8"),
+    "ai.onnxruntime.OrtEnvironment": types.SimpleNamespace(
+        getEnvironment=lambda: _Environment()),
+    "ai.onnxruntime.OrtSession$SessionOptions": _SessionOptions,
+    "ai.onnxruntime.OrtSession$SessionOptions$OptLevel":
+        types.SimpleNamespace(ALL_OPT=99, NO_OPT=0),
+    "ai.onnxruntime.OrtSession$SessionOptions$ExecutionMode":
+        types.SimpleNamespace(SEQUENTIAL="SEQUENTIAL", PARALLEL="PARALLEL"),
+    "java.nio.ByteBuffer": _ByteBuffer,
+    "java.nio.ByteOrder": types.SimpleNamespace(nativeOrder=lambda: None),
+    "java.util.HashMap": _HashMap,
+    "java.util.HashSet": _HashSet,
+}
+
+
+@pytest.fixture
+def jnius(monkeypatch):
+    module = types.ModuleType("jnius")
+    module.autoclass = _CLASSES.__getitem__
+    monkeypatch.setitem(sys.modules, "jnius", module)
+    monkeypatch.setattr(bg_remover, "_graph_cache_enabled", False)
+    STATS.update(Stats())
+    return module
+
+
+# ---------------------------------------------------------------------------
+# Stand-in models
+# ---------------------------------------------------------------------------
+
+def _make_model(path, outputs: int, batch="batch"):
+    """U2Net-like signature: input.1 -> d0..d<outputs-1>, sigmoids."""
+    from onnx import TensorProto, helper, numpy_helper
+
+    weight = np.full((1, 3, 1, 1), 0.3, dtype=np.float32)
+    nodes = [helper.make_node("Conv", ["input.1", "w"], ["feat"])]
+    infos = []
+    for i in range(outputs):
+        nodes.append(helper.make_node("Sigmoid", ["feat"], [f"d{i}"]))
+        infos.append(helper.make_tensor_value_info(
+            f"d{i}", TensorProto.FLOAT, [batch, 1, SIZE, SIZE]))
+    graph = helper.make_graph(
+        nodes, "standin",
+        [helper.make_tensor_value_info(
+            "input.1", TensorProto.FLOAT, [batch, 3, SIZE, SIZE])],
+        infos, [numpy_helper.from_array(weight, "w")],
+    )
+    model = helper.make_model(
+        graph, opset_imports=[helper.make_opsetid("", 13)])
+    model.ir_version = 8
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture(params=[7, 1], ids=["seven-outputs", "single-output"])
+def model_path(request, tmp_path):
+    return _make_model(tmp_path / "standin.onnx", request.param)
+
+
+def _reference(path, name, feed):
+    session = ort.InferenceSession(path, providers=["CPUExecutionProvider"])
+    return session.run([name], {"input.1": feed})[0]
+
+
+# ---------------------------------------------------------------------------
+# Tests
+# ---------------------------------------------------------------------------
+
+def test_pinned_run_matches_onnxruntime(jnius, model_path):
+    session = bg_remover._AndroidOnnxSession(model_path)
+    name = session.get_outputs()[-1].name
+    feed = np.random.default_rng(0).random(
+        (1, 3, SIZE, SIZE), dtype=np.float32)
+
+    out = session.run([name], {"input.1": feed})[0]
+
+    np.testing.assert_allclose(out, _reference(model_path, name, feed),
+                               rtol=1e-6)
+
+
+def test_buffers_are_reused_across_runs(jnius, model_path):
+    session = bg_remover._AndroidOnnxSession(model_path)
+    name = session.get_outputs()[0].name
+    feed = np.zeros((1, 3, SIZE, SIZE), dtype=np.float32)
+
+    session.run([name], {"input.1": feed})
+    # One input and one output slot: a direct buffer and a tensor each
+    assert STATS == {"alloc": 2, "tensor": 2, "copy": 3}
+
+    STATS.update(Stats())
+    for _ in range(5):
+        session.run([name], {"input.1": feed})
+    # Per run: input upload, getByteBuffer and array(); nothing allocated
+    assert STATS == {"alloc": 0, "tensor": 0, "copy": 15}
+
+
+def test_new_batch_size_gets_its_own_slots(jnius, model_path):
+    session = bg_remover._AndroidOnnxSession(model_path)
+    name = session.get_outputs()[0].name
+    for batch in (1, 2, 1, 2):
+        feed = np.zeros((batch, 3, SIZE, SIZE), dtype=np.float32)
+        out = session.run([name], {"input.1": feed})[0]
+        assert out.shape == (batch, 1, SIZE, SIZE)
+    assert STATS["alloc"] == 4 and STATS["tensor"] == 4
+
+
+def test_unknown_output_shape_is_requested_not_pinned(jnius, tmp_path):
+    path = _make_model(tmp_path / "dynamic.onnx", 1, batch="batch")
+    session = bg_remover._AndroidOnnxSession(path)
+    # Hide the spatial dims so the output cannot be preallocated
+    session._output_shapes["d0"] = [None, 1, None, None]
+    feed = np.ones((1, 3, SIZE, SIZE), dtype=np.float32)
+
+    out = session.run(["d0"], {"input.1": feed})[0]
+
+    np.testing.assert_allclose(out, _reference(path, "d0", feed), rtol=1e-6)
+    assert STATS["alloc"] == 1        # the input slot only
@@ -0,0 +1,192 @@
+"""
+Find the fastest ONNX Runtime session options for this machine.
+
+Benchmarks combinations of the ``SessionConfig`` settings (intra-op
+threads, spinning, execution mode, memory arena / pattern) on the real
+model and saves the best one to ``models/session_profile.json``, which
+``bg_remover`` loads for every new session.
+
+The search is greedy, one setting at a time, keeping a change only when
+it beats the current best by more than ``--min-gain``.  With ``--workers
+N`` it runs N sessions concurrently (one thread each, ORT releases the
+GIL) with the thread budget split between them, and ranks by aggregate
+throughput, so the profile fits a box packed with N batch workers.
+
+Desktop-only tool: requires ``onnxruntime``.
+
+    python tune_session.py [--model u2net] [--workers 1] [--runs 10]
+                           [--json report.json] [--dry-run]
+"""
+
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+
+import numpy as np
+
+from model_registry import DEFAULT_MODEL, get_model_spec
+from session_config import PROFILE_PATH, SessionConfig, save_profile
+
+
+def measure(model, config: SessionConfig, workers: int, runs: int) -> dict:
+    """``{images_per_second, latency_ms}`` for *workers* concurrent
+    sessions each running *runs* timed inferences."""
+    import bg_remover
+
+    spec = get_model_spec(model)
+    path = bg_remover.get_model_path(spec)
+    sessions = [bg_remover._create_desktop_session(path, config)
+                for _ in range(workers)]
+    barrier = threading.Barrier(workers + 1)
+    latencies = [[] for _ in range(workers)]
+    errors = []
+
+    def worker(i):
+        try:
+            session = sessions[i]
+            tensor = bg_remover._get_input_buffer(session, spec)
+            tensor[...] = np.random.default_rng(i).integers(
+                0, 255, tensor.shape).astype(tensor.dtype)
+            feed = {session.get_inputs()[0].name: tensor}
+            outputs = [bg_remover._mask_output_name(session, spec)]
+            for _ in range(2):
+                session.run(outputs, feed)
+        except Exception as e:
+            errors.append(e)
+        barrier.wait()
+        if errors:
+            return
+        for _ in range(runs):
+            start = time.perf_counter()
+            session.run(outputs, feed)
+            latencies[i].append((time.perf_counter() - start) * 1000.0)
+
+    threads = [threading.Thread(target=worker, args=(i,))
+               for i in range(workers)]
+    for t in threads:
+        t.start()
+    barrier.wait()
+    start = time.perf_counter()
+    for t in threads:
+        t.join()
+    elapsed = time.perf_counter() - start
+    if errors:
+        raise errors[0]
+
+    return {
+        "images_per_second": workers * runs / elapsed,
+        "latency_ms": float(np.median([v for lat in latencies for v in lat])),
+    }
+
+
+def _thread_candidates(budget: int) -> list:
+    counts = {budget}
+    n = 1
+    while n < budget:
+        counts.add(n)
+        n *= 2
+    return sorted(counts)
+
+
+def _stages(budget: int) -> list:
+    """``(title, candidates(best))`` for each greedy step."""
+    return [
+        ("intra-op threads", lambda b: [
+            b.replace(intra_op_threads=n) for n in _thread_candidates(budget)]),
+        ("spinning", lambda b: [
+            b.replace(allow_spinning=not b.allow_spinning)]),
+        ("execution mode", lambda b: [
+            b.replace(execution_mode="parallel", inter_op_threads=2)]),
+        ("memory", lambda b: [
+            b.replace(cpu_mem_arena=a, mem_pattern=p)
+            for a, p in ((True, False), (False, True), (False, False))]),
+    ]
+
+
+def tune(model=DEFAULT_MODEL, workers: int = 1, runs: int = 10,
+         min_gain: float = 0.03):
+    """Return ``(best_config, trials)``; *trials* lists every measurement."""
+    budget = max(1, (os.cpu_count() or 1) // workers)
+    trials = []
+
+    def trial(config):
+        row = dict(config.to_dict(), **measure(model, config, workers, runs))
+        trials.append(row)
+        print(f"  {row['images_per_second']:7.2f} img/s "
+              f"{row['latency_ms']:8.1f} ms  {config}")
+        return row["images_per_second"]
+
+    best = SessionConfig(intra_op_threads=budget)
+    print("[baseline]")
+    best_score = trial(best)
+
+    for title, candidates in _stages(budget):
+        print(f"[{title}]")
+        # Candidates derive from the current best so earlier wins carry over
+        for config in candidates(best):
+            if config == best:
+                continue
+            score = trial(config)
+            if score > best_score * (1.0 + min_gain):
+                best, best_score = config, score
+
+    return best, trials
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--workers", type=int, default=1,
+                        help="concurrent sessions sharing this machine")
+    parser.add_argument("--runs", type=int, default=10,
+                        help="timed runs per session and setting")
+    parser.add_argument("--min-gain", type=float, default=0.03,
+                        help="relative speed-up needed to change a setting")
+    parser.add_argument("--output", default=PROFILE_PATH,
+                        help="where to save the profile")
+    parser.add_argument("--json", help="also write every trial to this file")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="report only, do not save the profile")
+    args = parser.parse_args(argv)
+
+    try:
+        import onnxruntime  # noqa: F401
+    except ImportError:
+        print("[ERROR] 'onnxruntime' is required: pip install onnxruntime")
+        return 1
+
+    import bg_remover
+    if not bg_remover.check_model_exists(args.model):
+        print(f"[ERROR] Model not found: {bg_remover.get_model_path(args.model)}")
+        print("  Run download_model.py first.")
+        return 1
+
+    workers = max(1, args.workers)
+    print(f"Tuning {args.model}: {workers} worker(s), "
+          f"{os.cpu_count()} CPUs, {args.runs} runs per trial")
+    best, trials = tune(args.model, workers, args.runs, args.min_gain)
+    best_row = next(t for t in trials if SessionConfig.from_dict(t) == best)
+
+    print()
+    print(f"Best: {best}")
+    print(f"      {best_row['images_per_second']:.2f} img/s, "
+          f"{best_row['latency_ms']:.1f} ms median")
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"model": args.model, "workers": workers,
+                       "best": best.to_dict(), "trials": trials}, f, indent=2)
+        print(f"Report written to {args.json}")
+    if not args.dry_run:
+        save_profile(best, args.output, model=args.model, workers=workers,
+                     images_per_second=best_row["images_per_second"],
+                     latency_ms=best_row["latency_ms"])
+        print(f"[OK] Profile saved: {args.output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
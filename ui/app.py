@@ -42,17 +42,19 @@ class RemoveBGApp(MDApp):
     def on_start(self):
         """Called when the app starts"""
         import threading
-        thread = threading.Thread(target=self._preload_model, daemon=True)
-        thread.start()
+        self._preload_thread = threading.Thread(
+            target=self._preload_model, daemon=True
+        )
+        self._preload_thread.start()
 
     def _preload_model(self):
-        """Pre-load the background removal model"""
+        """Pre-load and warm up the background removal model"""
         try:
-            from bg_remover import get_session, check_model_exists, get_model_path
+            from bg_remover import preload, check_model_exists, get_model_path
             print(f"[BG Remover] Model path: {get_model_path()}")
             print(f"[BG Remover] Model exists: {check_model_exists()}")
             if check_model_exists():
-                get_session()
+                preload()
                 print("[BG Remover] Session pre-loaded OK")
             else:
                 print("[BG Remover] Model not found – skipping preload")
@@ -3,64 +3,122 @@ KivyMD Screen Definitions
 """
 
 from kivy.lang import Builder
-from kivy.properties import StringProperty, BooleanProperty, ListProperty, NumericProperty
+from kivy.properties import StringProperty, BooleanProperty, ListProperty, NumericProperty, ObjectProperty
 from kivy.clock import Clock
-from kivy.uix.colorpicker import ColorPicker
-from kivy.uix.modalview import ModalView
-from kivy.uix.boxlayout import BoxLayout
-from kivy.uix.button import Button
 from kivy.graphics.texture import Texture
 from kivy.graphics import Color, Rectangle
+from kivy.metrics import dp
 from kivy.uix.widget import Widget
 from kivy.utils import platform
 from kivymd.uix.screen import MDScreen
-from plyer import filechooser
+from concurrent.futures import CancelledError
 import threading
 import os
 import tempfile
 import shutil
-from PIL import Image as PILImage
-
-# Path for generated checkerboard image
-_CHECKER_PATH = os.path.join(tempfile.gettempdir(), "rembg_checker.png")
-
-
-def _create_checker_image():
-    """Create a checkerboard PNG file for transparent background preview"""
-    if os.path.exists(_CHECKER_PATH):
-        return _CHECKER_PATH
-    # Classic white/light-grey checkerboard
-    square_size = 10
-    cols, rows = 40, 40
-    w = cols * square_size
-    h = rows * square_size
-    img = PILImage.new('RGB', (w, h))
-    pixels = img.load()
-    c1 = (255, 255, 255)
-    c2 = (204, 204, 204)
-    for y in range(h):
-        for x in range(w):
-            if (x // square_size + y // square_size) % 2 == 0:
-                pixels[x, y] = c1
-            else:
-                pixels[x, y] = c2
-    img.save(_CHECKER_PATH)
-    return _CHECKER_PATH
+
+# Heavy or rarely used modules (plyer, PIL, ColorPicker) are imported where
+# they are needed so importing this module stays cheap.
+
+# Checkerboard behind transparent previews: white/light-grey squares of
+# this many dp, drawn from a repeating 2x2 texture
+_CHECKER_SQUARE = 10
+_CHECKER_COLORS = (b"\xff\xff\xff\xff", b"\xcc\xcc\xcc\xff")
+_checker_texture = None
+
+
+def _get_checker_texture():
+    """The 2x2 checker tile, one texel per square (created once)"""
+    global _checker_texture
+    if _checker_texture is None:
+        c1, c2 = _CHECKER_COLORS
+        data = c1 + c2 + c2 + c1
+
+        def upload(texture):
+            texture.blit_buffer(data, colorfmt="rgba", bufferfmt="ubyte")
+
+        texture = Texture.create(size=(2, 2), colorfmt="rgba")
+        texture.wrap = "repeat"
+        texture.min_filter = "nearest"
+        texture.mag_filter = "nearest"
+        upload(texture)
+        # Re-upload after the GL context is lost (Android pause/resume)
+        texture.add_reload_observer(upload)
+        _checker_texture = texture
+    return _checker_texture
+
+
+def _remove_file(path):
+    if path:
+        try:
+            os.remove(path)
+        except OSError:
+            pass
+
+
+def fit_image(image, size):
+    """*image* scaled down to fit within *size* pixels (never enlarged)"""
+    from PIL import Image as PILImage
+    # Same sizing as the progressive preview, so its texture is not resampled
+    from bg_remover import fit_size
+
+    fitted = fit_size(image.size, size)
+    if fitted == image.size:
+        return image
+    return image.resize(fitted, PILImage.BILINEAR, reducing_gap=2.0)
+
+
+def _texture_from_image(image):
+    """Upload a PIL image into a new texture with blit_buffer"""
+    if image.mode not in ("RGB", "RGBA"):
+        image = image.convert("RGBA")
+    fmt = image.mode.lower()
+    if fmt == "rgb" and image.size[0] * 3 % 4:
+        # Keep rows 4-byte aligned for the GL upload
+        image = image.convert("RGBA")
+        fmt = "rgba"
+    data = image.tobytes()
+
+    def upload(texture):
+        texture.blit_buffer(data, colorfmt=fmt, bufferfmt="ubyte")
+
+    texture = Texture.create(size=image.size, colorfmt=fmt)
+    upload(texture)
+    texture.add_reload_observer(upload)
+    # PIL rows run top-down, GL rows bottom-up
+    texture.flip_vertical()
+    return texture
 
 
 class ImagePreview(Widget):
-    """Widget that draws bg color/checkerboard behind image, matching image aspect ratio"""
+    """Widget that draws bg color/checkerboard behind image, matching image aspect ratio
+
+    Shows ``image`` (an in-memory PIL image, uploaded at display size) when
+    set, otherwise the file at ``source``.
+    """
     source = StringProperty("")
+    image = ObjectProperty(None, allownone=True)
     bg_color = ListProperty([0, 0, 0, 0])
     show_checker = BooleanProperty(True)
 
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self._image = None
-        self._checker_image = None
-        self.bind(source=self._redraw, bg_color=self._redraw,
+        self._texture = None
+        self._texture_key = None
+        self.bind(source=self._redraw, image=self._redraw, bg_color=self._redraw,
                   show_checker=self._redraw, size=self._redraw, pos=self._redraw)
 
+    def _image_texture(self):
+        """Texture of ``image`` fitted to the widget, rebuilt on resize"""
+        size = (max(1, int(self.width)), max(1, int(self.height)))
+        key = self._texture_key
+        # Compare images by identity: PIL's == compares the pixels
+        if key is None or key[0] is not self.image or key[1] != size:
+            self._texture = _texture_from_image(fit_image(self.image, size))
+            self._texture_key = (self.image, size)
+        return self._texture
+
     def _get_image_rect(self):
         """Calculate centered rect that preserves image aspect ratio"""
         if not self._image or not self._image.texture:
@@ -81,22 +139,14 @@ class ImagePreview(Widget):
         return x, y, new_w, new_h
 
     def _redraw(self, *args):
-        if not self.source:
+        if not self.source and self.image is None:
             # Hide checker and image when no source
-            if self._checker_image:
-                self._checker_image.opacity = 0
+            self.canvas.before.clear()
             if self._image:
                 self._image.opacity = 0
             return
 
-        # Lazy create child widgets
-        if self._checker_image is None:
-            from kivy.uix.image import Image as KivyImage
-            self._checker_image = KivyImage(
-                allow_stretch=True, keep_ratio=True, opacity=0
-            )
-            self.add_widget(self._checker_image)
-
+        # Lazy create child widget
         if self._image is None:
             from kivy.uix.image import Image as KivyImage
             self._image = KivyImage(
@@ -104,7 +154,14 @@ class ImagePreview(Widget):
             )
             self.add_widget(self._image)
 
-        self._image.source = self.source
+        if self.image is not None:
+            # In-memory result: no file to decode
+            if self._image.source:
+                self._image.source = ""
+            self._image.texture = self._image_texture()
+        else:
+            self._texture = self._texture_key = None
+            self._image.source = self.source
         self._image.size = self.size
         self._image.pos = self.pos
         self._image.opacity = 1
@@ -113,16 +170,15 @@ class ImagePreview(Widget):
 
         # Show checkerboard or solid color behind image
         self.canvas.before.clear()
-        if self.show_checker:
-            # Use checkerboard image behind the actual image
-            checker_path = _create_checker_image()
-            self._checker_image.source = checker_path
-            self._checker_image.pos = (x, y)
-            self._checker_image.size = (w, h)
-            self._checker_image.opacity = 1
-        else:
-            self._checker_image.opacity = 0
-            with self.canvas.before:
+        with self.canvas.before:
+            if self.show_checker:
+                Color(1, 1, 1, 1)
+                square = dp(_CHECKER_SQUARE)
+                u, v = w / (2 * square), h / (2 * square)
+                Rectangle(pos=(x, y), size=(w, h),
+                          texture=_get_checker_texture(),
+                          tex_coords=(0, 0, u, 0, u, v, 0, v))
+            else:
                 Color(*self.bg_color)
                 Rectangle(pos=(x, y), size=(w, h))
 
@@ -191,6 +247,7 @@ KV = '''
             size_hint_y: 1 if root.image_source else 0.001
             opacity: 1 if root.image_source else 0
             source: root.image_source
+            image: root.preview_image
             bg_color: root.preview_bg_color
             show_checker: root.show_checker
         
@@ -339,14 +396,22 @@ KV = '''
                 height: dp(46)
 '''
 
-# Load KV before class definition
-Builder.load_string(KV)
+_kv_loaded = False
+
+
+def _load_kv():
+    """Load the KV rules once, right before the first MainScreen is built."""
+    global _kv_loaded
+    if not _kv_loaded:
+        Builder.load_string(KV)
+        _kv_loaded = True
 
 
 class MainScreen(MDScreen):
     """Main screen for background removal app"""
     
     image_source = StringProperty("")
+    preview_image = ObjectProperty(None, allownone=True)  # in-memory result
     status_text = StringProperty("")
     is_processing = BooleanProperty(False)
     result_available = BooleanProperty(False)
@@ -357,15 +422,18 @@ class MainScreen(MDScreen):
     selected_btn_bg = ListProperty([0.0, 0.75, 0.65, 0.4])  # Teal highlight
     
     def __init__(self, **kwargs):
+        _load_kv()
         super().__init__(**kwargs)
         self._original_path = None
-        self._result_path = None
-        self._result_image = None
+        self._result_path = None  # full-resolution PNG, written in the background
+        self._cutout = None  # retained RGB/alpha planes for background swaps
+        self._cancel = None  # threading.Event of the running job
         self._temp_input_path = None  # temp copy of selected image on Android
     
     def select_image(self):
         """Open file chooser to select an image"""
         try:
+            from plyer import filechooser
             filechooser.open_file(
                 on_selection=self._on_file_selected,
                 filters=[("Images", "*.png", "*.jpg", "*.jpeg", "*.webp", "*.bmp")]
@@ -430,6 +498,10 @@ class MainScreen(MDScreen):
 
         path = selection[0]
 
+        # A job still running for the previous image is dropped
+        self._cancel_processing()
+        self._discard_result()
+
         # Clean up previous temp input
         if self._temp_input_path and os.path.exists(self._temp_input_path):
             try:
@@ -452,7 +524,7 @@ class MainScreen(MDScreen):
         self.image_source = path
         self.status_text = f"Loaded: {os.path.basename(path)}"
         self.result_available = False
-        self._result_image = None
+        self.preview_image = None
         self.bg_color = [0, 0, 0, 0]
     
     def process_image(self):
@@ -462,13 +534,35 @@ class MainScreen(MDScreen):
         
         self.is_processing = True
         self.status_text = "Processing..."
+        self._discard_result()
+        cancel = self._cancel = threading.Event()
+        preview_size = tuple(self.ids.img_preview.size)
         
         # Run in background thread
-        thread = threading.Thread(target=self._process_in_thread)
+        thread = threading.Thread(target=self._process_in_thread,
+                                  args=(self._original_path, preview_size, cancel))
         thread.start()
+
+    def _cancel_processing(self):
+        """Stop the running job after its current step; its results are ignored"""
+        if self._cancel is not None:
+            self._cancel.set()
+            self._cancel = None
+            self.is_processing = False
+
+    def _discard_result(self):
+        self._cutout = None
+        if self._result_path:
+            _remove_file(self._result_path)
+            self._result_path = None
     
-    def _process_in_thread(self):
-        """Background thread for image processing"""
+    def _process_in_thread(self, path, preview_size, cancel):
+        """Background thread for image processing
+
+        Shows a preview-size cutout as soon as the mask exists, then makes
+        and encodes the full-resolution result.
+        """
+        temp_path = None
         try:
             # On Android, ensure this thread is attached to the JVM
             if platform == "android":
@@ -477,39 +571,82 @@ class MainScreen(MDScreen):
                 except Exception:
                     pass
 
-            from bg_remover import remove_background
+            from bg_remover import remove_background_progressive, is_ready
+            from compositor import Cutout
+            from instrumentation import collect
 
-            # Create temp file for result
-            fd, temp_path = tempfile.mkstemp(suffix=".png")
-            os.close(fd)
+            # Let a still-running startup preload finish instead of
+            # loading a second session alongside it
+            if not is_ready():
+                from kivymd.app import MDApp
+                preload = getattr(MDApp.get_running_app(), "_preload_thread", None)
+                if preload is not None and preload.is_alive():
+                    Clock.schedule_once(
+                        lambda dt: setattr(self, "status_text", "Loading model...")
+                    )
+                    preload.join()
 
-            print(f"[BG Remover] Processing: {self._original_path}")
+            print(f"[BG Remover] Processing: {path}")
 
-            # Process image and keep PIL result
-            result_img = remove_background(self._original_path, temp_path)
+            def on_preview(preview):
+                Clock.schedule_once(lambda dt: self._on_preview(cancel, preview))
 
-            print(f"[BG Remover] Done → {temp_path}")
+            # The full-resolution PNG is written here so saving is a copy
+            fd, temp_path = tempfile.mkstemp(suffix=".png")
+            os.close(fd)
 
-            self._result_path = temp_path
-            self._result_image = result_img
+            # Keep the result's planes for background swaps
+            with collect() as reports:
+                result_img = remove_background_progressive(
+                    path, preview_size, on_preview, temp_path, cancel=cancel)
+            timing = reports[-1].summary(limit=3) if reports else ""
+            cutout = Cutout.from_image(result_img)
 
-            # Update UI on main thread
-            Clock.schedule_once(lambda dt: self._on_process_complete(True))
+            print(f"[BG Remover] Done → {temp_path} ({timing})")
 
+            # Update UI on main thread
+            Clock.schedule_once(
+                lambda dt: self._on_process_complete(
+                    cancel, True, timing=timing, cutout=cutout,
+                    result_path=temp_path))
+
+        except CancelledError:
+            print(f"[BG Remover] Cancelled: {path}")
+            _remove_file(temp_path)
         except Exception as e:
             import traceback
             traceback.print_exc()
             err_msg = str(e)
             print(f"[BG Remover] ERROR: {err_msg}")
-            Clock.schedule_once(lambda dt: self._on_process_complete(False, err_msg))
+            _remove_file(temp_path)
+            Clock.schedule_once(
+                lambda dt: self._on_process_complete(cancel, False, err_msg))
+
+    def _on_preview(self, cancel, preview):
+        """Show the preview-size cutout while the full result is made"""
+        if cancel is not self._cancel:
+            return
+        self.preview_image = preview
+        self.show_checker = True
+        self.status_text = "Preview ready, finishing full resolution..."
     
-    def _on_process_complete(self, success, error=None):
+    def _on_process_complete(self, cancel, success, error=None, timing="",
+                             cutout=None, result_path=None):
         """Called when processing completes"""
+        if cancel is not self._cancel:
+            # Result of a job cancelled by picking another image
+            _remove_file(result_path)
+            return
+        self._cancel = None
         self.is_processing = False
         
         if success:
-            self.image_source = self._result_path
-            self.status_text = "Done! Pick a background color below."
+            self._cutout = cutout
+            self._result_path = result_path
+            if timing:
+                self.status_text = f"Done in {timing}. Pick a background color below."
+            else:
+                self.status_text = "Done! Pick a background color below."
             self.result_available = True
             self.bg_color = [0, 0, 0, 0]
             self.show_checker = True
@@ -534,6 +671,11 @@ class MainScreen(MDScreen):
     
     def open_color_picker(self):
         """Open Kivy's built-in color picker in a popup"""
+        from kivy.uix.boxlayout import BoxLayout
+        from kivy.uix.button import Button
+        from kivy.uix.colorpicker import ColorPicker
+        from kivy.uix.modalview import ModalView
+
         popup = ModalView(size_hint=(0.9, 0.7))
         
         layout = BoxLayout(orientation='vertical', padding=10, spacing=10)
@@ -566,11 +708,12 @@ class MainScreen(MDScreen):
     
     def save_image(self):
         """Save the processed image"""
-        if not self._result_path:
+        if not self._cutout:
             return
         
         try:
             # Get save location
+            from plyer import filechooser
             filechooser.save_file(
                 on_selection=self._on_save_location_selected,
                 filters=[("PNG Image", "*.png")]
@@ -607,28 +750,28 @@ class MainScreen(MDScreen):
         self._do_save(save_path)
     
     def _do_save(self, save_path):
-        """Actually save the file with background color applied"""
+        """Encode and write the result off the UI thread"""
+        self.status_text = "Saving..."
+        color = list(self.bg_color)
+        threading.Thread(
+            target=self._save_in_thread,
+            args=(self._cutout, self._result_path, color, save_path)
+        ).start()
+
+    def _save_in_thread(self, cutout, result_path, color, save_path):
+        """Background thread: save the file with background color applied"""
         try:
-            if self._result_image and self.bg_color[3] > 0:
-                result = self._apply_bg_color(self._result_image)
-                result.save(save_path)
+            if color[3] > 0:
+                self._apply_bg_color(cutout, color).save(save_path)
             else:
-                shutil.copy2(self._result_path, save_path)
-            
-            self.status_text = f"Saved: {os.path.basename(save_path)}"
+                # Already encoded while the preview was showing
+                shutil.copy2(result_path, save_path)
+            text = f"Saved: {os.path.basename(save_path)}"
         except Exception as e:
-            self.status_text = f"Save failed: {str(e)}"
+            text = f"Save failed: {str(e)}"
+        Clock.schedule_once(lambda dt: setattr(self, "status_text", text))
     
-    def _apply_bg_color(self, img):
-        """Apply background color to image"""
-        if img.mode != 'RGBA':
-            return img
-        
-        r = int(self.bg_color[0] * 255)
-        g = int(self.bg_color[1] * 255)
-        b = int(self.bg_color[2] * 255)
-        
-        background = PILImage.new('RGBA', img.size, (r, g, b, 255))
-        background.paste(img, mask=img.split()[3])
-        
-        return background
+    def _apply_bg_color(self, cutout, color=None):
+        """Composite the retained cutout over the selected background color"""
+        color = color or self.bg_color
+        return cutout.over_color([int(c * 255) for c in color[:3]])